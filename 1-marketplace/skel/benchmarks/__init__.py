@@ -0,0 +1,7 @@
+"""
+Benchmarks for the Marketplace implementation.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
@@ -0,0 +1,67 @@
+"""
+Measures the add_to_cart throughput as the Marketplace's inventory grows.
+
+Usage: python3 -m benchmarks.add_to_cart [max_inventory_size]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import sys
+import time
+
+from tema import marketplace as market
+from tema.product import Tea
+
+DISTINCT_PRODUCTS = 1000
+OPERATIONS = 10000
+
+
+def run(inventory_size):
+    """
+    Publishes inventory_size units spread over at most DISTINCT_PRODUCTS products and
+    then adds OPERATIONS units to a single cart.
+
+    :type inventory_size: Int
+    :param inventory_size: the number of units published before the measurement
+
+    :returns the number of add_to_cart calls per second
+    """
+    products = [Tea(f'Tea {i}', 1, 'Black')
+                for i in range(min(inventory_size, DISTINCT_PRODUCTS))]
+
+    marketplace = market.Marketplace(inventory_size)
+    producer_id = marketplace.register_producer()
+    for i in range(inventory_size):
+        marketplace.publish(producer_id, products[i % len(products)])
+
+    operations = min(inventory_size, OPERATIONS)
+    cart_id = marketplace.new_cart()
+
+    start = time.perf_counter()
+    for i in range(operations):
+        marketplace.add_to_cart(cart_id, products[-1 - i % len(products)])
+    elapsed = time.perf_counter() - start
+
+    return operations / elapsed
+
+
+def main():
+    """
+    Runs the benchmark for inventories of 10 up to 1,000,000 units.
+    """
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    # the per-call log lines would dominate the measurement
+    market.logger.disabled = True
+
+    print(f"{'inventory':>10} {'add_to_cart/s':>15}")
+    size = 10
+    while size <= max_size:
+        print(f"{size:>10} {run(size):>15.0f}")
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
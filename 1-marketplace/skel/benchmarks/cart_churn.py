@@ -0,0 +1,63 @@
+"""
+Measures new_cart/place_order churn with many consumer threads.
+
+Usage: python3 -m benchmarks.cart_churn [threads] [carts_per_thread]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import io
+import sys
+import time
+from threading import Thread
+
+from tema import marketplace as market
+from tema.order_sink import OrderSink
+
+
+def churn(marketplace, carts):
+    """
+    Creates and orders empty carts.
+    """
+    for _ in range(carts):
+        marketplace.place_order(marketplace.new_cart())
+
+
+def run(threads, carts):
+    """
+    Runs churn in the given number of threads.
+
+    :returns the number of new_cart/place_order pairs per second
+    """
+    marketplace = market.Marketplace(1, order_sink=OrderSink(io.StringIO()))
+    workers = [Thread(target=churn, args=(marketplace, carts)) for _ in range(threads)]
+
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    assert len(marketplace.cart_dic) == 0
+    return threads * carts / elapsed
+
+
+def main():
+    """
+    Runs the benchmark with 1 and with 64 threads, by default.
+    """
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    carts = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    # the per-call log lines would dominate the measurement
+    market.logger.disabled = True
+
+    for count in sorted({1, threads}):
+        print(f"{count:>3} threads {run(count, carts):>12.0f} carts/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares the Marketplace's global and striped locking under a many-consumer load.
+
+The products and the number of producers and consumers come from a test configuration;
+the consumers add and remove products in a tight loop, without the configured sleeps.
+
+Usage: python3 -m benchmarks.locking [test_file] [operations_per_consumer]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import random
+import sys
+import time
+from json import loads
+from threading import Thread
+
+from tema import marketplace as market
+from tema.product import Coffee, Tea
+
+PRODUCT_TYPES = {'Coffee': Coffee, 'Tea': Tea}
+
+
+def load_config(filename):
+    """
+    Returns the products, the producers' count and the consumers' count of a test file.
+    """
+    with open(filename, encoding='utf-8') as input_file:
+        market_config = loads(input_file.read())
+
+    products = []
+    for product_dict in market_config['products'].values():
+        params = {k: v for k, v in product_dict.items() if k != 'product_type'}
+        products.append(PRODUCT_TYPES[product_dict['product_type']](**params))
+
+    return products, len(market_config['producers']), len(market_config['consumers'])
+
+
+def consume(marketplace, products, operations, seed):
+    """
+    Alternates add_to_cart and remove_from_cart calls on random products.
+    """
+    rand = random.Random(seed)
+    cart_id = marketplace.new_cart()
+
+    for _ in range(operations):
+        product = rand.choice(products)
+        if marketplace.add_to_cart(cart_id, product):
+            marketplace.remove_from_cart(cart_id, product)
+
+
+def run(locking, products, producers, consumers, operations):
+    """
+    Runs the load against a Marketplace with the given locking mode.
+
+    :returns the number of consumer operations per second
+    """
+    units = 10
+    marketplace = market.Marketplace(units * len(products), locking=locking)
+    for _ in range(producers):
+        producer_id = marketplace.register_producer()
+        for product in products:
+            for _ in range(units):
+                marketplace.publish(producer_id, product)
+
+    threads = [Thread(target=consume, args=(marketplace, products, operations, i))
+               for i in range(consumers)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return consumers * operations / elapsed
+
+
+def main():
+    """
+    Runs the benchmark for both locking modes.
+    """
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'tests/10.in'
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    # the per-call log lines would dominate the measurement
+    market.logger.disabled = True
+
+    products, producers, consumers = load_config(filename)
+    print(f"{filename}: {len(products)} products, {producers} producers, "
+          f"{consumers} consumers")
+    for locking in ('global', 'striped'):
+        ops = run(locking, products, producers, consumers, operations)
+        print(f"{locking:>8} {ops:>12.0f} ops/s")
+
+
+if __name__ == '__main__':
+    main()
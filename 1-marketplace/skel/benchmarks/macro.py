@@ -0,0 +1,75 @@
+"""
+Runs the test configurations as macro-benchmarks: every test file is run by test.py
+with the given engine, timed, and its output is checked against the reference.
+
+Usage: python3 -m benchmarks.macro [engine] [test_file...]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import glob
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from check_test import purchases
+from tema.engines import DEFAULT_ENGINE
+
+TESTS = 'tests/*.in'
+TIMEOUT = 60
+
+
+def run(filename, engine=DEFAULT_ENGINE, timeout=TIMEOUT):
+    """
+    Runs a test file with test.py.
+
+    :type filename: String
+    :param filename: the test configuration, next to its .ref.out file
+
+    :type engine: String
+    :param engine: the engine that test.py runs the test with
+
+    :returns a dictionary with the run's wall time in seconds and whether its output
+    matches the reference, which is False if the test times out
+    """
+    start = time.perf_counter()
+    try:
+        process = subprocess.run([sys.executable, 'test.py', '--engine', engine, '--log', 'off',
+                                  filename], capture_output=True, text=True, timeout=timeout,
+                                 check=False)
+    except subprocess.TimeoutExpired:
+        return {"test": filename, "engine": engine, "seconds": time.perf_counter() - start,
+                "passed": False}
+    elapsed = time.perf_counter() - start
+
+    with open(filename[:-len('.in')] + '.ref.out', encoding='utf-8') as ref_file:
+        expected = Counter(purchases([ref_file.read()]))
+
+    return {"test": filename, "engine": engine, "seconds": elapsed,
+            "passed": process.returncode == 0 and Counter(purchases([process.stdout])) == expected}
+
+
+def run_all(engine=DEFAULT_ENGINE, filenames=None, timeout=TIMEOUT):
+    """
+    Yields the result of every test file, tests/*.in by default.
+    """
+    for filename in filenames or sorted(glob.glob(TESTS)):
+        yield run(filename, engine, timeout)
+
+
+def main():
+    """
+    Runs the test files and prints a line for every one.
+    """
+    engine = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_ENGINE
+
+    for result in run_all(engine, sys.argv[2:]):
+        status = 'PASSED' if result['passed'] else 'FAILED'
+        print(f"{result['test']:>14} {result['engine']:>10} {result['seconds']:>8.2f} s {status}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Measures the throughput and the latency of every Marketplace operation, over a sweep
+of thread counts, producer queue sizes and product cardinalities.
+
+Every thread runs the same phases: it registers producers, publishes units round-robin
+over them so that every producer's queue fills up to queue_size, creates carts, adds
+units to them, removes some of them and places the orders. The threads wait for each
+other between the phases, so every phase measures a single operation.
+
+Usage: python3 -m benchmarks.operations [operations_per_thread]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import io
+import itertools
+import sys
+import time
+from threading import Barrier, Thread
+
+from tema import marketplace as market
+from tema.order_sink import OrderSink
+from tema.product import Tea
+
+OPERATIONS = ('register_producer', 'publish', 'new_cart', 'add_to_cart',
+              'remove_from_cart', 'place_order')
+THREADS = (1, 4, 16)
+QUEUE_SIZES = (1, 16, 256)
+PRODUCTS = (10, 1000)
+# the number of units added to every cart
+CART_SIZE = 16
+
+
+def percentile(samples, fraction):
+    """
+    Returns the sample below which the given fraction of the sorted samples lie.
+    """
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def summarize(latencies, elapsed):
+    """
+    Returns the throughput and the latency percentiles of a phase.
+
+    :type latencies: List
+    :param latencies: the duration of every call, in nanoseconds
+
+    :type elapsed: Int
+    :param elapsed: the duration of the phase, in nanoseconds
+    """
+    latencies.sort()
+    return {"calls": len(latencies),
+            "ops_per_sec": len(latencies) * 1e9 / max(elapsed, 1),
+            "p50_us": percentile(latencies, 0.5) / 1000,
+            "p99_us": percentile(latencies, 0.99) / 1000}
+
+
+def worker(marketplace, products, queue_size, operations, barrier, timings):
+    """
+    Runs the phases in a thread, appending (first call start, last call end, call
+    durations) to timings[operation] and waiting on barrier after each phase.
+    """
+    clock = time.perf_counter_ns
+
+    def timed(operation, call, args):
+        samples = []
+        results = []
+        first = clock()
+        for arg in args:
+            start = clock()
+            results.append(call(*arg))
+            samples.append(clock() - start)
+
+        timings[operation].append((first, clock(), samples))
+        barrier.wait()
+        return results
+
+    producers = -(-operations // queue_size)
+    producer_ids = timed('register_producer', marketplace.register_producer,
+                         [()] * producers)
+    timed('publish', marketplace.publish,
+          [(producer_ids[i % producers], products[i % len(products)])
+           for i in range(operations)])
+
+    carts = -(-operations // CART_SIZE)
+    cart_ids = timed('new_cart', marketplace.new_cart, [()] * carts)
+    units = [(cart_ids[i % carts], products[i % len(products)]) for i in range(operations)]
+    timed('add_to_cart', marketplace.add_to_cart, units)
+    timed('remove_from_cart', marketplace.remove_from_cart, units[::2])
+    timed('place_order', marketplace.place_order, [(cart_id,) for cart_id in cart_ids])
+
+
+def run(threads, queue_size, products, operations):
+    """
+    Runs the phases in the given number of threads against a fresh Marketplace.
+
+    :returns a dictionary operation -> summary, see summarize
+    """
+    marketplace = market.Marketplace(queue_size, order_sink=OrderSink(io.StringIO()))
+    products = [Tea(f'Tea {i}', 1, 'Black') for i in range(products)]
+
+    barrier = Barrier(threads)
+    timings = {operation: [] for operation in OPERATIONS}
+    workers = [Thread(target=worker, args=(marketplace, products, queue_size, operations,
+                                           barrier, timings))
+               for _ in range(threads)]
+
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    # a phase lasts from the first call of any thread to the last one, without
+    # the time that the threads take to leave the barrier
+    summaries = {}
+    for operation, phase in timings.items():
+        firsts, lasts, samples = zip(*phase)
+        summaries[operation] = summarize(list(itertools.chain.from_iterable(samples)),
+                                         max(lasts) - min(firsts))
+
+    return summaries
+
+
+def sweep(operations, threads=THREADS, queue_sizes=QUEUE_SIZES, products=PRODUCTS):
+    """
+    Yields a result for every operation of every combination of the parameters.
+    """
+    for thread_count, queue_size, product_count in itertools.product(threads, queue_sizes,
+                                                                     products):
+        summaries = run(thread_count, queue_size, product_count, operations)
+        for operation, summary in summaries.items():
+            yield {"operation": operation, "threads": thread_count, "queue_size": queue_size,
+                   "products": product_count, **summary}
+
+
+def main():
+    """
+    Runs the sweep and prints a line for every result.
+    """
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    # the per-call log lines would dominate the measurement
+    market.logger.disabled = True
+
+    print(f"{'operation':>16} {'threads':>7} {'queue':>5} {'products':>8} "
+          f"{'ops/s':>10} {'p50 us':>8} {'p99 us':>8}")
+    for result in sweep(operations):
+        print(f"{result['operation']:>16} {result['threads']:>7} {result['queue_size']:>5} "
+              f"{result['products']:>8} {result['ops_per_sec']:>10.0f} "
+              f"{result['p50_us']:>8.1f} {result['p99_us']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Measures how the processes engine scales with the number of worker processes,
+on a generated configuration with many consumers and short sleeps.
+
+Usage: python3 -m benchmarks.processes [consumers] [max_processes]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import io
+import random
+import sys
+import time
+
+from tema.catalog import ProductCatalog
+from tema.product import Coffee, Tea
+from tema.shared_marketplace import run_processes
+
+PRODUCTS = 10
+PRODUCERS = 8
+CARTS = 2
+OPERATIONS = 3
+MAX_QUANTITY = 3
+
+
+def generate_config(consumers, seed=0):
+    """
+    Returns a market configuration with product objects instead of product ids, the
+    way test.py builds it, and its catalog.
+
+    The producers fill their queues right away, with every product in turn, and the
+    queues can hold twice the most units that the consumers buy, so the run measures the
+    consumers' work and no producer blocks on a product that nobody wants anymore.
+    """
+    rand = random.Random(seed)
+    catalog = ProductCatalog()
+    products = [catalog.canonical(Coffee(f'Coffee {i}', i, 5.0, 'MEDIUM') if i % 2 else
+                                  Tea(f'Tea {i}', i, 'Green'))
+                for i in range(PRODUCTS)]
+
+    producers = [{"name": f"prod{i + 1}",
+                  "products": [(product, 1, 0) for product in products],
+                  "republish_wait_time": 0.05}
+                 for i in range(PRODUCERS)]
+    consumers = [{"name": f"cons{i + 1}",
+                  "retry_wait_time": 0.1,
+                  "carts": [[{"type": "add", "product": rand.choice(products),
+                              "quantity": rand.randint(1, MAX_QUANTITY)}
+                             for _ in range(OPERATIONS)]
+                            for _ in range(CARTS)]}
+                 for i in range(consumers)]
+
+    units = len(consumers) * CARTS * OPERATIONS * MAX_QUANTITY
+    market_config = {"producers": producers, "consumers": consumers,
+                     "marketplace": {"queue_size_per_producer": 2 * units // PRODUCERS}}
+    return market_config, catalog
+
+
+def main():
+    """
+    Runs the generated configuration with 1, 2, 4 and 8 worker processes, by default.
+    """
+    consumers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    max_processes = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    market_config, catalog = generate_config(consumers)
+    units = sum(operation["quantity"] for consumer in market_config["consumers"]
+                for cart in consumer["carts"] for operation in cart)
+    print(f"{consumers} consumers, {units} units bought")
+
+    processes = 1
+    while processes <= max_processes:
+        output = io.StringIO()
+        start = time.perf_counter()
+        run_processes(market_config, catalog, processes, log_mode='off', stream=output)
+        elapsed = time.perf_counter() - start
+
+        assert output.getvalue().count('\n') == units
+        print(f"{processes:>2} processes {elapsed:>8.2f} s {units / elapsed:>10.0f} units/s")
+        processes *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""
+Replays a trace recorded by test.py --trace against a fresh Marketplace of any
+engine, as fast as possible, and reports its throughput and the calls whose result
+differs from the recorded one.
+
+By default every recorded thread is replayed by a thread of its own, or by a task of
+its own with the asyncio engines, after all the producers are registered; --serial
+replays the calls in the order they were made, in a single thread. The recorded waits
+are not replayed: every call returns at once. The processes engine replays the calls
+against a SharedMarketplace over a shared inventory, in this process.
+
+Usage: python3 -m benchmarks.replay trace_file [--engine ENGINE] [--serial]
+                                    [--locking MODE] [--stripes N] [--fair] [--repeat N]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import argparse
+import asyncio
+import io
+import time
+from collections import Counter
+from threading import Barrier, Thread
+
+from tema import opcodes as ops
+from tema import trace as tr
+from tema.async_marketplace import AsyncMarketplace
+from tema.catalog import ProductCatalog
+from tema.engines import ASYNC_ENGINES, DEFAULT_ENGINE, ENGINES
+from tema.marketplace import Marketplace
+from tema.order_sink import OrderSink
+from tema.product import PRODUCT_TYPES
+from tema.shared_marketplace import SharedInventory, SharedMarketplace
+from tema.simulation import run_simulation
+
+# operation -> the Marketplace call, given the marketplace, the owner's replayed id,
+# the product and the quantity
+CALLS = {
+    ops.PUBLISH: lambda market, owner, product, quantity: market.publish(owner, product),
+    ops.PUBLISH_MANY: lambda market, owner, product, quantity:
+        market.publish_many(owner, product, quantity),
+    ops.ADD_TO_CART: lambda market, owner, product, quantity:
+        market.add_to_cart(owner, product, quantity),
+    ops.ADD_MANY: lambda market, owner, product, quantity:
+        market.add_many(owner, product, quantity),
+    ops.REMOVE_FROM_CART: lambda market, owner, product, quantity:
+        market.remove_from_cart(owner, product, quantity),
+    ops.REMOVE_MANY: lambda market, owner, product, quantity:
+        market.remove_many(owner, product, quantity),
+}
+PRODUCER_OPERATIONS = (ops.PUBLISH, ops.PUBLISH_MANY)
+
+
+def parse_args():
+    """
+    Parses the command line.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("trace", help="the trace file")
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                        help="the engine whose Marketplace replays the calls")
+    parser.add_argument("--serial", action="store_true",
+                        help="replay the calls in their order, in a single thread")
+    parser.add_argument("--locking", choices=["global", "striped"], default="global",
+                        help="the locking mode of the threads engine")
+    parser.add_argument("--stripes", type=int, default=64)
+    parser.add_argument("--fair", action="store_true",
+                        help="hand off the units in order, with the threads engine")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="the number of replays, each against a fresh Marketplace")
+
+    return parser.parse_args()
+
+
+def load(filename):
+    """
+    Reads a trace file.
+
+    :returns a pair: the footer, with the products turned into Products, and the records
+    """
+    footer, records = tr.read_trace(filename)
+    footer["products"] = [PRODUCT_TYPES[description.pop("product_type")](**description)
+                          for description in footer["products"]]
+
+    return footer, records
+
+
+def replay_steps(marketplace, products, records, producers, carts):
+    """
+    Makes the calls of records, in their order. It is a generator, so that the same
+    steps drive the Marketplaces whose calls return their result and those whose calls
+    return a coroutine: it yields what every call returns, and is sent back its result.
+
+    :type producers: Dict
+    :param producers: recorded producer id -> replayed producer id
+
+    :type carts: Dict
+    :param carts: recorded cart id -> replayed cart id, filled as the carts are created
+
+    :returns a Counter of the calls whose result differs from the recorded one, by operation
+    """
+    mismatches = Counter()
+    for _, _, operation, owner, product_id, quantity, result in records:
+        call = CALLS.get(operation)
+        if call is not None:
+            owner = producers[owner] if operation in PRODUCER_OPERATIONS else carts[owner]
+            if int((yield call(marketplace, owner, products[product_id], quantity))) != result:
+                mismatches[ops.OPERATIONS[operation]] += 1
+        elif operation == ops.NEW_CART:
+            carts[result] = marketplace.new_cart()
+        elif operation == ops.PLACE_ORDER:
+            yield marketplace.place_order(carts[owner])
+        elif operation == ops.REGISTER_PRODUCER:
+            producers[result] = marketplace.register_producer()
+
+    return mismatches
+
+
+def replay_records(marketplace, products, records, producers, carts):
+    """
+    Makes the calls of records against a Marketplace whose calls return their result,
+    see replay_steps.
+    """
+    steps = replay_steps(marketplace, products, records, producers, carts)
+    try:
+        result = next(steps)
+        while True:
+            result = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def replay_records_async(marketplace, products, records, producers, carts):
+    """
+    Makes the calls of records against an AsyncMarketplace, see replay_steps.
+    """
+    steps = replay_steps(marketplace, products, records, producers, carts)
+    try:
+        call = next(steps)
+        while True:
+            call = steps.send(await call)
+    except StopIteration as stop:
+        return stop.value
+
+
+def by_thread(footer, records):
+    """
+    Splits the records other than the producers' registrations by recorded thread.
+
+    :returns a pair: the registrations, in their order, and the list of the records of
+    every thread
+    """
+    registrations = sorted(record for record in records if record[2] == ops.REGISTER_PRODUCER)
+    threads = [[] for _ in footer["threads"]]
+    for record in records:
+        if record[2] != ops.REGISTER_PRODUCER:
+            threads[record[1]].append(record)
+
+    return registrations, threads
+
+
+def replay(marketplace, footer, records, serial=False):
+    """
+    Replays the records against a Marketplace whose calls return their result.
+
+    :type marketplace: Marketplace
+    :param marketplace: a fresh Marketplace, whose catalog holds the trace's products
+    in their order, so that the product ids match
+
+    :type footer: Dict
+    :param footer: the trace's footer, see load
+
+    :type serial: Boolean
+    :param serial: replay the calls in their order, in a single thread
+
+    :returns a dictionary with the number of replayed calls, their duration in seconds
+    and the Counter of the calls whose result differs from the recorded one
+    """
+    products = footer["products"]
+    producers = {}
+    carts = {}
+
+    if serial:
+        records = sorted(records)
+        start = time.perf_counter()
+        mismatches = replay_records(marketplace, products, records, producers, carts)
+        elapsed = time.perf_counter() - start
+        return {"calls": len(records), "seconds": elapsed, "mismatches": mismatches}
+
+    # the producers are registered by the main thread, before their threads use them
+    registrations, thread_records = by_thread(footer, records)
+    replay_records(marketplace, products, registrations, producers, carts)
+
+    barrier = Barrier(len(thread_records) + 1)
+    results = []
+
+    def run(thread_records):
+        barrier.wait()
+        results.append(replay_records(marketplace, products, thread_records, producers, carts))
+
+    threads = [Thread(target=run, args=(calls,), name=name)
+               for name, calls in zip(footer["threads"], thread_records)]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {"calls": len(records) - len(registrations), "seconds": elapsed,
+            "mismatches": sum(results, Counter())}
+
+
+async def replay_async(marketplace, footer, records, serial=False):
+    """
+    Replays the records against an AsyncMarketplace, with a task for every recorded
+    thread unless serial is set, see replay.
+    """
+    products = footer["products"]
+    producers = {}
+    carts = {}
+
+    if serial:
+        records = sorted(records)
+        start = time.perf_counter()
+        mismatches = await replay_records_async(marketplace, products, records, producers,
+                                                carts)
+        elapsed = time.perf_counter() - start
+        return {"calls": len(records), "seconds": elapsed, "mismatches": mismatches}
+
+    registrations, thread_records = by_thread(footer, records)
+    await replay_records_async(marketplace, products, registrations, producers, carts)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        asyncio.create_task(replay_records_async(marketplace, products, calls, producers,
+                                                 carts), name=name)
+        for name, calls in zip(footer["threads"], thread_records)))
+    elapsed = time.perf_counter() - start
+
+    return {"calls": len(records) - len(registrations), "seconds": elapsed,
+            "mismatches": sum(results, Counter())}
+
+
+def new_marketplace(engine, footer, records, args):
+    """
+    Returns a fresh Marketplace of the engine, with the trace's products and queue size.
+    """
+    queue_size = footer["queue_size_per_producer"]
+    order_sink = OrderSink(io.StringIO())
+    catalog = ProductCatalog(footer["products"])
+
+    if engine in ASYNC_ENGINES:
+        return AsyncMarketplace(queue_size, order_sink=order_sink, catalog=catalog)
+    if engine == 'processes':
+        producers = sum(record[2] == ops.REGISTER_PRODUCER for record in records)
+        return SharedMarketplace(SharedInventory(queue_size, len(catalog), producers),
+                                 order_sink=order_sink, catalog=catalog)
+
+    return Marketplace(queue_size, locking=args.locking, stripes=args.stripes,
+                       order_sink=order_sink, catalog=catalog, fair=args.fair)
+
+
+def run_replay(engine, marketplace, footer, records, serial=False):
+    """
+    Replays the records against a Marketplace of the engine, see replay.
+    """
+    if engine == 'asyncio':
+        return asyncio.run(replay_async(marketplace, footer, records, serial))
+    if engine == 'simulation':
+        return run_simulation(replay_async(marketplace, footer, records, serial))
+
+    return replay(marketplace, footer, records, serial)
+
+
+def main():
+    """
+    Replays the trace and prints a line for every replay.
+    """
+    args = parse_args()
+    footer, records = load(args.trace)
+
+    for _ in range(args.repeat):
+        result = run_replay(args.engine, new_marketplace(args.engine, footer, records, args),
+                            footer, records, args.serial)
+        mismatches = ", ".join(f"{operation} {count}"
+                               for operation, count in sorted(result["mismatches"].items()))
+        print(f"{result['calls']} calls in {result['seconds']:.3f} s, "
+              f"{result['calls'] / max(result['seconds'], 1e-9):.0f} calls/s, "
+              f"{sum(result['mismatches'].values())} mismatches"
+              f"{f' ({mismatches})' if mismatches else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Measures how long test.py takes to start: the time its imports take, read from
+python -X importtime, and the wall time of test.py --help, that imports the modules
+of the default engine and exits.
+
+The modules that the interpreter imports on its own, those that python -c pass
+imports too, are not counted. test.py is run once per test, so its imports are paid
+by every test; the suite fails the run when they exceed the budget.
+
+Usage: python3 -m benchmarks.startup [--repeat N] [--budget MS] [--top N]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+# the budget of the imports of test.py, in milliseconds; they took about 155 ms when
+# every engine was imported upfront, and 75 ms once they were imported on demand
+IMPORT_BUDGET_MS = 100
+REPEAT = 5
+TOP = 10
+
+
+def parse_args():
+    """
+    Parses the command line.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help="the number of runs, the fastest one is reported")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_MS,
+                        help="the budget of the imports, in milliseconds")
+    parser.add_argument("--top", type=int, default=TOP,
+                        help="the number of the slowest imports to list")
+
+    return parser.parse_args()
+
+
+def import_times(arguments):
+    """
+    Runs the interpreter with -X importtime and the given arguments.
+
+    :returns a pair: a list of (module, depth, self microseconds, cumulative
+    microseconds), in the order the imports finished, and the run's wall time in seconds
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', *arguments],
+                             capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        # the nested imports are indented by two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(self_time), int(cumulative)))
+
+    return imports, elapsed
+
+
+def measure(script='test.py', arguments=('--help',)):
+    """
+    Measures the startup of a script once.
+
+    :returns a dictionary with the time the imports of the script took, in
+    milliseconds, its wall time in seconds and its imports, as (module, self
+    milliseconds, cumulative milliseconds), the slowest first
+    """
+    interpreter = {name for name, _, _, _ in import_times(['-c', 'pass'])[0]}
+    imports, elapsed = import_times([script, *arguments])
+
+    own = [(name, self_time / 1000, cumulative / 1000)
+           for name, _, self_time, cumulative in imports if name not in interpreter]
+    # the cumulative times of the top-level imports cover the nested ones
+    total = sum(cumulative / 1000 for name, depth, _, cumulative in imports
+                if depth == 0 and name not in interpreter)
+
+    return {"import_ms": total, "seconds": elapsed,
+            "imports": sorted(own, key=lambda entry: entry[2], reverse=True)}
+
+
+def run(repeat=REPEAT, budget=IMPORT_BUDGET_MS):
+    """
+    Measures the startup of test.py repeat times.
+
+    :returns the fastest measurement, see measure, with the budget and whether it is met
+    """
+    result = min((measure() for _ in range(repeat)), key=lambda result: result['import_ms'])
+    result.update({"budget_ms": budget, "within_budget": result['import_ms'] <= budget})
+
+    return result
+
+
+def main():
+    """
+    Measures the startup, prints the slowest imports and exits with 1 when the
+    imports exceed the budget.
+    """
+    args = parse_args()
+    result = run(args.repeat, args.budget)
+
+    for name, self_time, cumulative in result['imports'][:args.top]:
+        print(f"{name:>32} {self_time:>8.2f} ms {cumulative:>8.2f} ms cumulative")
+    print(f"imports {result['import_ms']:.2f} ms (budget {result['budget_ms']:g} ms), "
+          f"test.py --help {result['seconds'] * 1000:.0f} ms")
+
+    sys.exit(0 if result['within_budget'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Runs the operation sweep and the macro-benchmarks and saves their results as JSON,
+optionally comparing them with the results of an earlier run.
+
+Usage: python3 -m benchmarks.suite [--output FILE] [--baseline FILE] [--engine ENGINE...]
+                                   [--operations N] [--threads N...] [--queue-sizes N...]
+                                   [--products N...] [--tests FILE...]
+                                   [--import-budget MS]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import macro, operations, startup
+from tema import marketplace as market
+from tema.engines import DEFAULT_ENGINE
+
+# the throughput changes smaller than this are reported as noise
+THRESHOLD = 0.1
+
+
+def parse_args():
+    """
+    Parses the command line.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default="benchmark-results.json",
+                        help="the file the results are saved to")
+    parser.add_argument("--baseline", help="the results of an earlier run to compare with")
+    parser.add_argument("--engine", nargs="+", default=[DEFAULT_ENGINE],
+                        help="the test.py engines of the macro-benchmarks")
+    parser.add_argument("--operations", type=int, default=2000,
+                        help="the calls of every operation made by every thread")
+    parser.add_argument("--threads", type=int, nargs="+", default=operations.THREADS)
+    parser.add_argument("--queue-sizes", type=int, nargs="+", default=operations.QUEUE_SIZES)
+    parser.add_argument("--products", type=int, nargs="+", default=operations.PRODUCTS)
+    parser.add_argument("--tests", nargs="*", default=None,
+                        help="the test files to run, tests/*.in by default; none skips them")
+    parser.add_argument("--import-budget", type=float, default=startup.IMPORT_BUDGET_MS,
+                        help="the budget of the imports of test.py, in milliseconds; the run "
+                             "fails when they exceed it")
+
+    return parser.parse_args()
+
+
+def revision():
+    """
+    Returns the current git revision, or None outside a work tree.
+    """
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def operation_key(result):
+    """
+    Returns what identifies an operation result across runs.
+    """
+    return (result['operation'], result['threads'], result['queue_size'], result['products'])
+
+
+def compare(results, baseline):
+    """
+    Prints the operations whose throughput changed by more than THRESHOLD and the
+    macro-benchmarks whose time or outcome changed.
+    """
+    before = {operation_key(result): result for result in baseline['operations']}
+    for result in results['operations']:
+        old = before.get(operation_key(result))
+        if old is None:
+            continue
+
+        change = result['ops_per_sec'] / old['ops_per_sec'] - 1
+        if abs(change) > THRESHOLD:
+            print(f"{result['operation']:>16} threads={result['threads']} "
+                  f"queue={result['queue_size']} products={result['products']}: "
+                  f"{old['ops_per_sec']:.0f} -> {result['ops_per_sec']:.0f} ops/s "
+                  f"({change:+.0%})")
+
+    before = {(result['test'], result['engine']): result for result in baseline['macro']}
+    for result in results['macro']:
+        old = before.get((result['test'], result['engine']))
+        if old is None:
+            continue
+
+        change = result['seconds'] / old['seconds'] - 1
+        if old['passed'] != result['passed'] or abs(change) > THRESHOLD:
+            print(f"{result['test']:>16} {result['engine']}: {old['seconds']:.2f} -> "
+                  f"{result['seconds']:.2f} s ({change:+.0%}), "
+                  f"{'passed' if result['passed'] else 'FAILED'}")
+
+    old = baseline.get('startup')
+    if old is not None:
+        change = results['startup']['import_ms'] / old['import_ms'] - 1
+        if abs(change) > THRESHOLD:
+            print(f"{'startup':>16}: {old['import_ms']:.2f} -> "
+                  f"{results['startup']['import_ms']:.2f} ms of imports ({change:+.0%})")
+
+
+def main():
+    """
+    Runs the benchmarks and saves the results. Exits with 1 when the imports of
+    test.py exceed their budget.
+    """
+    args = parse_args()
+
+    # the per-call log lines would dominate the measurement
+    market.logger.disabled = True
+
+    results = {"revision": revision(), "python": platform.python_version(),
+               "time": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+               "startup": startup.run(budget=args.import_budget),
+               "operations": list(operations.sweep(args.operations, args.threads,
+                                                   args.queue_sizes, args.products)),
+               "macro": [] if args.tests == [] else [
+                   result for engine in args.engine
+                   for result in macro.run_all(engine, args.tests)]}
+
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=4)
+    print(f"saved {len(results['operations'])} operation and {len(results['macro'])} "
+          f"macro results to {args.output}")
+
+    failed = [result['test'] for result in results['macro'] if not result['passed']]
+    if failed:
+        print(f"failed: {' '.join(failed)}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            compare(results, json.load(baseline_file))
+
+    if not results['startup']['within_budget']:
+        print(f"the imports of test.py took {results['startup']['import_ms']:.2f} ms, "
+              f"over the budget of {args.import_budget:g} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,7 @@ TIMEOUT_VAL=360
 PYTHON_CMD=python3
 SRC=tema
 
-timeout $TIMEOUT_VAL ./run_tests.sh &> result
+timeout $TIMEOUT_VAL ${PYTHON_CMD} run_tests.py &> result
 
 if [ ! $? -eq 0 ]
 then
@@ -5,41 +5,116 @@ Computer Systems Architecture Course
 Assignment 1
 March 2021
 """
-import subprocess
 import sys
+from collections import Counter
 
+CHUNK_SIZE = 1 << 16
+# the number of differing entries that are reported, of each kind
+REPORT_LIMIT = 10
 
-def main():
-    if len(sys.argv) != 4:
-        print("Invalid number of arguments\nUsage: check_test.py testname output_filepath ref_filepath")
-        return
 
-    testname = sys.argv[1]
-    output_filename = sys.argv[2]
-    ref_filename = sys.argv[3]
-    # load the lines from the output file and sort them
+def purchases(chunks):
+    """
+    Yields the "<consumer> bought <product>" entries of a text that comes in chunks.
+    The entries are split on ")", since sometimes there is no new line between
+    consumer outputs.
+
+    :type chunks: Iterable
+    :param chunks: the text, in pieces of any size
+    """
+    rest = ""
+    for chunk in chunks:
+        entries = (rest + chunk).split(")")
+        rest = entries.pop()
+        for entry in entries:
+            entry = entry.strip()
+            if entry:
+                yield entry + ")"
+
+    rest = rest.strip()
+    if rest:
+        yield rest + ")"
+
+
+def read_chunks(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yields the text of stream in chunks, until its end.
+    """
+    return iter(lambda: stream.read(chunk_size), "")
+
+
+def compare(output_stream, ref_filename):
+    """
+    Compares the purchases read from output_stream with the reference, in any order.
+    Only the reference's distinct entries are kept in memory, the output is counted
+    as it is read.
+
+    :type output_stream: TextIO
+    :param output_stream: the output, e.g. a file or the stdout of a running test.py
+
+    :returns a pair of Counters: the entries missing from the output and the
+    unexpected ones, with how many times each of them is missing or unexpected
+    """
+    with open(ref_filename) as ref_file:
+        balance = Counter(purchases(read_chunks(ref_file)))
+    balance.subtract(purchases(read_chunks(output_stream)))
+
+    # the entries left positive are missing, the negative ones are unexpected
+    return +balance, -balance
+
+
+def check(output_filename, ref_filename):
+    """
+    Returns whether the output file holds the same purchases as the reference file,
+    in any order.
+    """
     with open(output_filename) as output_file:
-        output_lines = output_file.read()
+        missing, unexpected = compare(output_file, ref_filename)
+
+    return not missing and not unexpected
+
+
+def report(missing, unexpected, limit=REPORT_LIMIT):
+    """
+    Returns the lines that describe the differing entries, at most limit of each kind.
+    """
+    lines = []
+    for sign, entries in (("-", missing), ("+", unexpected)):
+        for entry, count in sorted(entries.items())[:limit]:
+            lines.append(f"  {sign} {count} x {entry}")
+        if len(entries) > limit:
+            lines.append(f"  {sign} ... and {len(entries) - limit} more entries")
+
+    return lines
 
-    output_lines = output_lines.split(")")  # sometimes there is no new line between consumer outputs
-    output_lines = [line.strip() + ")" for line in output_lines if len(line.strip()) > 0]
 
-    output_lines.sort()
+def result_line(testname, passed):
+    """
+    Returns the line that reports the test's result, as parse.awk expects it.
+    """
+    return f"Test {testname}" + ":\t\t" + ("PASSED" if passed else "FAILED")
 
-    sorted_output_filename = output_filename + ".sorted"
 
-    # write to input file (tests/{test_name}.in)
-    with open(sorted_output_filename, 'w') as sorted_output_file:
-        for line in output_lines:
-            print(line, file=sorted_output_file)
+def main():
+    if len(sys.argv) != 4:
+        print("Invalid number of arguments\nUsage: check_test.py testname output_filepath ref_filepath"
+              "\n(an output_filepath of - reads the output from stdin, e.g. piped from test.py)")
+        return
 
-    command = subprocess.Popen(["diff", sorted_output_filename, ref_filename], stdout=subprocess.PIPE)
-    out, err = command.communicate()
+    testname = sys.argv[1]
+    output_filename = sys.argv[2]
+    ref_filename = sys.argv[3]
 
-    if len(out) == 0:
-        print(f"Test {testname}" + ":\t\t" + "PASSED")
+    if output_filename == "-":
+        missing, unexpected = compare(sys.stdin, ref_filename)
     else:
-        print(f"Test {testname}" + ":\t\t" + "FAILED")
+        with open(output_filename) as output_file:
+            missing, unexpected = compare(output_file, ref_filename)
+
+    print(result_line(testname, not missing and not unexpected))
+    # the missing entries are marked with -, the unexpected ones with +, like in a diff
+    for line in report(missing, unexpected):
+        print(line)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""
+Runs the tests concurrently: every tests/NN.in is run by test.py in its own process,
+with its own output file, log file and timeout, at most --jobs of them at a time.
+The results are printed in the tests' order, in the format of run_tests.sh, that
+parse.awk reads, with the wall time of every test and the entries that differ from
+the reference. With --stream, the output is checked as test.py writes it, without
+an output file.
+
+Usage: python3 run_tests.py [--jobs N] [--engine ENGINE] [--log MODE] [--timeout SECONDS]
+                            [--stream] [test_number...]
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import argparse
+import glob
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from check_test import compare, report, result_line
+
+TESTS = 'tests'
+# the timeouts of run_tests.sh: 30 seconds for the tests 1-8, 60 for the others
+SHORT_TIMEOUT = 30
+LONG_TIMEOUT = 60
+SHORT_TESTS = 8
+# the tests mostly sleep, so they can run more of them than there are CPUs
+DEFAULT_JOBS = 8
+
+
+def parse_args():
+    """
+    Parses the command line.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tests", type=int, nargs="*",
+                        help="the numbers of the tests to run, all of tests/*.in by default")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help="the maximum number of tests that run at the same time")
+    parser.add_argument("--engine", default="threads", help="the test.py engine")
+    parser.add_argument("--log", default="queue",
+                        help="the test.py logging mode; every test logs to tests/NN.log")
+    parser.add_argument("--timeout", type=float,
+                        help="the timeout of every test, in seconds, instead of the "
+                             "run_tests.sh ones")
+    parser.add_argument("--stream", action="store_true",
+                        help="check the output as test.py writes it, instead of saving it "
+                             "to tests/NN.out")
+
+    return parser.parse_args()
+
+
+def test_numbers():
+    """
+    Returns the numbers of the tests in the tests directory, in ascending order.
+    """
+    return sorted(int(os.path.basename(filename)[:-len('.in')])
+                  for filename in glob.glob(os.path.join(TESTS, '[0-9]*.in')))
+
+
+def kill_group(pid):
+    """
+    Kills the process group led by pid, if it still exists.
+    """
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run(number, engine, log_mode, timeout=None, stream=False):
+    """
+    Runs a test with test.py and checks its output.
+
+    :type number: Int
+    :param number: the test number, NN in tests/NN.in
+
+    :type timeout: Float
+    :param timeout: the number of seconds after which the test is stopped, the
+    run_tests.sh timeout by default
+
+    :type stream: Boolean
+    :param stream: check the output while test.py writes it to a pipe, instead of
+    saving it to tests/NN.out and checking the file
+
+    :returns a dictionary with the test number, its timeout, whether it timed out,
+    whether it passed, the missing and unexpected entries, see check_test.compare,
+    and its wall time in seconds
+    """
+    if timeout is None:
+        timeout = SHORT_TIMEOUT if number <= SHORT_TESTS else LONG_TIMEOUT
+    prefix = os.path.join(TESTS, f"{number:02d}")
+    command = [sys.executable, 'test.py', '--engine', engine, '--log', log_mode,
+               '--log-file', prefix + '.log', prefix + '.in']
+
+    start = time.perf_counter()
+    # test.py leads a process group of its own, so that the workers of the processes
+    # engine are killed with it
+    if stream:
+        with subprocess.Popen(command, stdout=subprocess.PIPE, text=True,
+                              start_new_session=True) as process:
+            # the output is read until test.py exits or is killed
+            killer = threading.Timer(timeout, kill_group, args=(process.pid,))
+            killer.start()
+            missing, unexpected = compare(process.stdout, prefix + '.ref.out')
+            process.wait()
+            killer.cancel()
+            timed_out = process.returncode == -signal.SIGKILL
+    else:
+        with open(prefix + '.out', 'w', encoding='utf-8') as output_file, \
+                subprocess.Popen(command, stdout=output_file, start_new_session=True) as process:
+            try:
+                process.wait(timeout)
+                timed_out = False
+            except subprocess.TimeoutExpired:
+                kill_group(process.pid)
+                process.wait()
+                timed_out = True
+        with open(prefix + '.out', encoding='utf-8') as output_file:
+            missing, unexpected = compare(output_file, prefix + '.ref.out')
+    elapsed = time.perf_counter() - start
+
+    return {"test": number, "timeout": timeout, "timed_out": timed_out,
+            "passed": not missing and not unexpected, "missing": missing,
+            "unexpected": unexpected, "seconds": elapsed}
+
+
+def main():
+    """
+    Runs the tests and prints their results.
+    """
+    args = parse_args()
+    numbers = args.tests or test_numbers()
+
+    start = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        # map yields the results in the tests' order, as soon as they are ready
+        for result in pool.map(lambda number: run(number, args.engine, args.log, args.timeout,
+                                                  args.stream),
+                               numbers):
+            if result['timed_out']:
+                print(f"TIMEOUT. Test {result['test']} exceeded maximum allowed time of "
+                      f"{result['timeout']:g}")
+            print(f"Finished test {result['test']} in {result['seconds']:.2f} s")
+            print(result_line(result['test'], result['passed']))
+            for line in report(result['missing'], result['unexpected']):
+                print(line)
+            sys.stdout.flush()
+            failed += not result['passed']
+
+    print(f"\nRan {len(numbers)} tests in {time.perf_counter() - start:.2f} s, "
+          f"{failed} failed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+This module represents the asyncio Consumer.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import asyncio
+
+
+class AsyncConsumer:
+    """
+    Class that represents a consumer that runs as a coroutine.
+    """
+
+    def __init__(self, carts, marketplace, retry_wait_time, name=None):
+        """
+        Constructor.
+
+        :type carts: List
+        :param carts: a list of add and remove operations
+
+        :type marketplace: AsyncMarketplace
+        :param marketplace: a reference to the marketplace
+
+        :type retry_wait_time: Time
+        :param retry_wait_time: the maximum number of seconds that a consumer waits
+        for a product to become available before trying again
+
+        :type name: String
+        :param name: the consumer's name, the task that runs the consumer must have it too
+        """
+
+        self.carts = carts
+        self.marketplace = marketplace
+        self.retry_wait_time = retry_wait_time
+        self.name = name
+
+    async def run(self):
+        """
+        Fills and orders every cart.
+        """
+        for cart in self.carts:
+            cart_id = self.marketplace.new_cart()
+
+            for operation in cart:
+                count = int(operation["quantity"])
+
+                while count > 0:
+                    if operation["type"] == "remove":
+                        out = await self.marketplace.remove_many(cart_id, operation["product"],
+                                                                 count)
+                        if out == 0:
+                            await asyncio.sleep(self.retry_wait_time)
+                    else:
+                        out = await self.marketplace.add_many(cart_id, operation["product"],
+                                                              count, timeout=self.retry_wait_time)
+
+                    count -= out
+
+            await self.marketplace.place_order(cart_id)
+
+        self.marketplace.flush_orders()
@@ -0,0 +1,303 @@
+"""
+This module represents the asyncio Marketplace.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+import asyncio
+from tema.base_marketplace import BaseMarketplace, logger
+from tema.cart import Cart
+from tema.inventory import Inventory
+
+
+class AsyncMarketplace(BaseMarketplace):
+    """
+    Class that represents the Marketplace for producers and consumers that run as
+    coroutines on a single event loop. Since there is a single thread, no locks are
+    needed; waiting for room or stock is done with asyncio conditions.
+    """
+
+    def __init__(self, queue_size_per_producer, *, order_sink=None, catalog=None):
+        """
+        Constructor
+
+        :type queue_size_per_producer: Int
+        :param queue_size_per_producer: the maximum size of a queue associated with each producer
+
+        :type order_sink: OrderSink
+        :param order_sink: where the placed orders are written, stdout by default
+
+        :type catalog: ProductCatalog
+        :param catalog: the catalog that interns the products, usually filled when the
+        configuration is loaded; new products are added to it when first seen
+        """
+
+        super().__init__(queue_size_per_producer, Inventory(queue_size_per_producer),
+                         order_sink, catalog)
+
+    def register_producer(self):
+        """
+        Returns an id for the producer that calls this.
+        """
+        logger.info('register_producer')
+
+        return self._new_producer()
+
+    async def publish(self, producer_id, product, timeout=0):
+        """
+        Adds the product provided by the producer to the marketplace
+
+        :type producer_id: Int
+        :param producer_id: producer id
+
+        :type product: Product
+        :param product: the Product that will be published in the Marketplace
+
+        :type timeout: Float
+        :param timeout: the number of seconds to wait for room in the producer's queue;
+        0 returns at once and None waits until there is room
+
+        :returns True or False. If the caller receives False, it should wait and then try again.
+        """
+
+        if await self._publish(producer_id, product, 1, timeout) == 0:
+            return False
+
+        logger.info('publish')
+
+        return True
+
+    async def publish_many(self, producer_id, product, quantity, timeout=0):
+        """
+        Adds up to quantity units of the product provided by the producer, as many as
+        fit in the producer's queue.
+
+        :type producer_id: Int
+        :param producer_id: producer id
+
+        :type product: Product
+        :param product: the Product that will be published in the Marketplace
+
+        :type quantity: Int
+        :param quantity: the maximum number of units to add
+
+        :type timeout: Float
+        :param timeout: the number of seconds to wait for room for at least a unit;
+        0 returns at once and None waits until there is room
+
+        :returns the number of added units
+        """
+        logger.info('publish_many')
+
+        return await self._publish(producer_id, product, quantity, timeout)
+
+    def new_cart(self):
+        """
+        Creates a new cart for the consumer
+
+        :returns an int representing the cart_id
+        """
+        logger.info('new_cart')
+
+        return self.cart_dic.add(Cart())
+
+    async def add_to_cart(self, cart_id, product, quantity=1, timeout=0):
+        """
+        Adds quantity units of a product to the given cart, all of them or none.
+
+        :type cart_id: Int
+        :param cart_id: id cart
+
+        :type product: Product
+        :param product: the product to add to cart
+
+        :type quantity: Int
+        :param quantity: the number of units to add
+
+        :type timeout: Float
+        :param timeout: the number of seconds to wait for the product to become available;
+        0 returns at once and None waits until it is available
+
+        :returns True or False. If the caller receives False, it should wait and then try again
+        """
+        logger.info('add_to_cart')
+
+        return await self._add(cart_id, product, quantity, False, timeout) == quantity
+
+    async def add_many(self, cart_id, product, quantity, timeout=0):
+        """
+        Adds up to quantity units of a product to the given cart, as many as available.
+
+        :type cart_id: Int
+        :param cart_id: id cart
+
+        :type product: Product
+        :param product: the product to add to cart
+
+        :type quantity: Int
+        :param quantity: the maximum number of units to add
+
+        :type timeout: Float
+        :param timeout: the number of seconds to wait for at least a unit to become available;
+        0 returns at once and None waits until one is available
+
+        :returns the number of added units
+        """
+        logger.info('add_many')
+
+        return await self._add(cart_id, product, quantity, True, timeout)
+
+    async def remove_from_cart(self, cart_id, product, quantity=1):
+        """
+        Removes quantity units of a product from cart, all of them or none.
+
+        :type cart_id: Int
+        :param cart_id: id cart
+
+        :type product: Product
+        :param product: the product to remove from cart
+
+        :type quantity: Int
+        :param quantity: the number of units to remove
+
+        :returns True or False. False means that the cart has less than quantity units
+        """
+
+        logger.info('remove_from_cart')
+
+        return await self._remove(cart_id, product, quantity, False) == quantity
+
+    async def remove_many(self, cart_id, product, quantity):
+        """
+        Removes up to quantity units of a product from cart, as many as the cart has.
+
+        :type cart_id: Int
+        :param cart_id: id cart
+
+        :type product: Product
+        :param product: the product to remove from cart
+
+        :type quantity: Int
+        :param quantity: the maximum number of units to remove
+
+        :returns the number of removed units
+        """
+
+        logger.info('remove_many')
+
+        return await self._remove(cart_id, product, quantity, True)
+
+    async def place_order(self, cart_id):
+        """
+        Prints the products in the cart, on behalf of the current task.
+
+        :type cart_id: Int
+        :param cart_id: id cart
+        """
+
+        logger.info('place_order')
+        self.order_sink.write_order(asyncio.current_task().get_name(),
+                                    (self.catalog.product(product_id)
+                                     for product_id in self.cart_dic.pop(cart_id, None)))
+
+    async def _publish(self, producer_id, product, quantity, timeout):
+        """
+        Adds up to quantity units of product to the producer's queue and wakes up as
+        many tasks that wait for it.
+
+        :returns the number of added units
+        """
+        product_id = self.catalog.intern(product)
+        count = await self._wait_for(
+            self.space_available[producer_id],
+            lambda: self._put(producer_id, product_id, quantity) or None, timeout)
+        if count is None:
+            return 0
+
+        await self._notify(self._item_condition(product_id), count)
+        return count
+
+    async def _add(self, cart_id, product, quantity, partial, timeout):
+        """
+        Reserves up to quantity units of product and puts them in the cart,
+        see Inventory.reserve_many.
+
+        :returns the number of added units
+        """
+        product_id = self.catalog.intern(product)
+        owners = await self._wait_for(
+            self._item_condition(product_id),
+            lambda: self._reserve(product_id, quantity, partial) or None, timeout)
+        if owners is None:
+            return 0
+
+        self.cart_dic[cart_id].add(product_id, owners)
+        for prod_id, count in owners.items():
+            await self._notify(self.space_available[prod_id], count)
+
+        return sum(owners.values())
+
+    async def _remove(self, cart_id, product, quantity, partial):
+        """
+        Takes up to quantity units of product out of the cart and gives them back to
+        their producers. When partial is not set, either quantity units are removed or none.
+
+        :returns the number of removed units
+        """
+        product_id = self.catalog.intern(product)
+        owners = self._take(cart_id, product_id, quantity, partial)
+        if not owners:
+            return 0
+
+        removed = self._give_back(product_id, owners)
+        await self._notify(self._item_condition(product_id), removed)
+        return removed
+
+    def _new_condition(self, name):  # pylint: disable=unused-argument
+        """
+        Returns a new asyncio condition, see BaseMarketplace._new_condition.
+        """
+        return asyncio.Condition()
+
+    @staticmethod
+    async def _wait_for(condition, attempt, timeout):
+        """
+        Calls attempt until it returns something else than None, waiting for condition
+        to be signaled between the calls, for at most timeout seconds.
+
+        :returns the last result of attempt
+        """
+        result = attempt()
+        if result is not None:
+            return result
+
+        if timeout == 0:
+            # let the other tasks run, a caller that retries at once would starve them
+            await asyncio.sleep(0)
+            return None
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        async with condition:
+            while True:
+                result = attempt()
+                if result is not None:
+                    return result
+
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+
+                try:
+                    await asyncio.wait_for(condition.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+    @staticmethod
+    async def _notify(condition, count=1):
+        """
+        Wakes up count tasks that wait for condition.
+        """
+        async with condition:
+            condition.notify(count)
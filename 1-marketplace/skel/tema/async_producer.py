@@ -0,0 +1,68 @@
+"""
+This module represents the asyncio Producer.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+import asyncio
+from tema.producer import next_ready, units_ready
+
+
+class AsyncProducer:
+    """
+    Class that represents a producer that runs as a coroutine.
+    """
+
+    def __init__(self, products, marketplace, republish_wait_time, name=None):
+        """
+        Constructor.
+
+        @type products: List()
+        @param products: a list of products that the producer will produce
+
+        @type marketplace: AsyncMarketplace
+        @param marketplace: a reference to the marketplace
+
+        @type republish_wait_time: Time
+        @param republish_wait_time: the maximum number of seconds that a producer
+        waits for room in its queue before trying again
+
+        @type name: String
+        @param name: the producer's name
+        """
+
+        self.products = products
+        self.marketplace = marketplace
+        self.republish_wait_time = republish_wait_time
+        self.name = name
+        self.prod_id = self.marketplace.register_producer()
+
+    async def run(self):
+        """
+        Publishes the products forever; the task is cancelled when the consumers are done.
+        """
+        while True:
+            for product, quantity, wait_time in self.products:
+                await self.produce(product, quantity, wait_time)
+
+    async def produce(self, product, quantity, wait_time):
+        """
+        Publishes quantity units of the product, each one as soon as it is made, see
+        Producer.produce.
+        """
+        loop = asyncio.get_running_loop()
+        # when the next unit is ready
+        ready_at = loop.time() + wait_time
+        j = 0
+
+        while j < quantity:
+            if loop.time() < ready_at:
+                await asyncio.sleep(ready_at - loop.time())
+
+            start = loop.time()
+            count = await self.marketplace.publish_many(
+                self.prod_id, product, units_ready(quantity - j, ready_at, start, wait_time),
+                timeout=self.republish_wait_time)
+            ready_at = next_ready(ready_at, count, loop.time() - start, wait_time)
+            j += count
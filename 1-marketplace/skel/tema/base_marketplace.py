@@ -0,0 +1,185 @@
+"""
+This module represents what the Marketplace engines share: the inventory, the carts
+and the catalog, and the operations on them that do not wait. The threaded and the
+asyncio Marketplaces only differ in how they wait for room or stock and wake up the
+ones that wait.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+import logging
+from contextlib import nullcontext
+from tema.catalog import ProductCatalog
+from tema.marketlog import LOGGER_NAME
+from tema.order_sink import OrderSink
+from tema.registry import Registry
+
+# the handlers are attached by tema.marketlog.configure_logging
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class BaseMarketplace:
+    """
+    Class that holds the state of a Marketplace and the operations on it that do not
+    wait. The subclasses wait on the conditions that _new_condition makes between the
+    attempts.
+    """
+
+    def __init__(self, queue_size_per_producer, inventory, order_sink=None, catalog=None):
+        """
+        Constructor
+
+        :type queue_size_per_producer: Int
+        :param queue_size_per_producer: the maximum size of a queue associated with each producer
+
+        :type inventory: Inventory
+        :param inventory: the inventory of the producers' queues
+
+        :type order_sink: OrderSink
+        :param order_sink: where the placed orders are written, stdout by default
+
+        :type catalog: ProductCatalog
+        :param catalog: the catalog that interns the products, usually filled when the
+        configuration is loaded; new products are added to it when first seen
+        """
+
+        self.queue_size_per_producer = queue_size_per_producer
+        self.inventory = inventory
+        # guards the inventory, when it does not take its own locks
+        self.modify_cart = nullcontext()
+        # the ids are handed out without a lock, see Registry
+        self.cart_dic = Registry(start=1)
+        self.order_sink = order_sink or OrderSink()
+        self.catalog = catalog if catalog is not None else ProductCatalog()
+        # producer id -> condition signaled when a unit leaves the producer's queue
+        self.space_available = Registry()
+        # product id -> condition signaled when a unit of the product becomes available
+        self.item_available = {}
+        # guards the carts, when their holds expire
+        self.hold_lock = nullcontext()
+
+    def flush_orders(self):
+        """
+        Writes the orders that the order sink still keeps.
+        """
+        self.order_sink.flush()
+
+    def available(self, product):
+        """
+        Returns the number of units of product that can be added to a cart right now.
+        It takes no lock, so it does not slow down the producers and consumers, and the
+        count may be stale by the time the caller acts on it.
+
+        :type product: Product
+        :param product: the product
+        """
+        product_id = self.catalog.lookup(product)
+        return 0 if product_id is None else self.inventory.available(product_id)
+
+    def inventory_snapshot(self):
+        """
+        Returns the available products and their number of units, without taking any lock,
+        see Inventory.snapshot.
+
+        :returns a dictionary Product -> number of available units
+        """
+        return {self.catalog.product(product_id): count
+                for product_id, count in self.inventory.snapshot().items()}
+
+    def cart_contents(self, cart_id):
+        """
+        Returns the products in the cart and their number of units, without taking any
+        lock, see Cart.snapshot.
+
+        :type cart_id: Int
+        :param cart_id: id cart
+
+        :returns a dictionary Product -> number of units, or None if there is no such cart
+        """
+        cart = self.cart_dic.get(cart_id)
+        if cart is None:
+            return None
+
+        return {self.catalog.product(product_id): count
+                for product_id, count in cart.snapshot().items()}
+
+    def _new_producer(self):
+        """
+        Gives a new producer an id, a queue and the condition signaled when there is
+        room in its queue.
+        """
+        producer_id = self.space_available.add(self._new_condition('space_available'))
+        # only adds a key that nobody else uses yet, no lock is needed
+        self.inventory.add_producer(producer_id)
+
+        return producer_id
+
+    def _put(self, producer_id, product_id, quantity):
+        """
+        Adds up to quantity units of the product to the producer's queue, see
+        Inventory.put_many.
+        """
+        with self.modify_cart:
+            return self.inventory.put_many(producer_id, product_id, quantity)
+
+    def _reserve(self, product_id, quantity, partial):
+        """
+        Takes up to quantity units of the product out of the inventory in a single
+        critical section, see Inventory.reserve_many.
+        """
+        # a doomed attempt is skipped without taking the lock; a unit published after
+        # the check signals the condition that the caller waits on
+        if self.inventory.available(product_id) < (1 if partial else quantity):
+            return {}
+
+        with self.modify_cart:
+            return self.inventory.reserve_many(product_id, quantity, partial)
+
+    def _take(self, cart_id, product_id, quantity, partial):
+        """
+        Takes up to quantity units of the product out of the cart, see Cart.take.
+
+        :returns producer_id -> number of taken units, empty if there is no such cart
+        """
+        cart = self.cart_dic.get(cart_id)
+        if cart is None:
+            return {}
+
+        with self.hold_lock:
+            return cart.take(product_id, quantity, partial)
+
+    def _give_back(self, product_id, owners):
+        """
+        Gives units of the product back to their producers.
+
+        :type owners: Dict
+        :param owners: producer_id -> number of units, taken out of a cart
+
+        :returns the number of units given back
+        """
+        with self.modify_cart:
+            for prod_id, count in owners.items():
+                self.inventory.release(prod_id, product_id, count)
+
+        return sum(owners.values())
+
+    def _item_condition(self, product_id):
+        """
+        Returns the condition signaled when a unit of the product becomes available.
+        """
+        condition = self.item_available.get(product_id)
+        if condition is None:
+            condition = self.item_available.setdefault(product_id,
+                                                       self._new_condition('item_available'))
+
+        return condition
+
+    def _new_condition(self, name):
+        """
+        Returns a new condition that the producers or the consumers wait on.
+
+        :type name: String
+        :param name: 'space_available' or 'item_available', tells the conditions apart
+        """
+        raise NotImplementedError
@@ -0,0 +1,171 @@
+"""
+This module represents a consumer's cart.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+from collections import deque
+
+from tema.inventory import take_units
+
+
+class HoldExpired(Exception):
+    """
+    Raised when a cart is ordered after some of its units went back to the inventory
+    because their holds expired. The cart is not ordered, its owner can add the lost
+    units again and order it once more.
+    """
+
+    def __init__(self, units):
+        """
+        Constructor
+
+        :type units: Dict
+        :param units: Product -> number of units that left the cart when their holds expired
+        """
+        super().__init__(units)
+        self.units = units
+
+
+class Cart:
+    """
+    Class that counts the units in a cart by product and by the producer that
+    published them, so that adding and removing units take O(1) time and the cart
+    takes memory proportional to the number of distinct products.
+    """
+
+    def __init__(self):
+        # product_id -> {producer_id: number of units}
+        self.products = {}
+        # product_id -> deque of [deadline, number of units], the oldest hold first;
+        # only the carts of a Marketplace with a hold TTL have holds
+        self.holds = {}
+        # product_id -> number of units that left the cart when their holds expired,
+        # until the owner of the cart is told
+        self.expired = {}
+
+    def __len__(self):
+        return sum(sum(owners.values()) for owners in self.products.values())
+
+    def __iter__(self):
+        """
+        Yields the product id of every unit in the cart, product after product.
+        """
+        for product_id, owners in self.products.items():
+            for _ in range(sum(owners.values())):
+                yield product_id
+
+    def add(self, product_id, owners):
+        """
+        Puts units of the product in the cart.
+
+        :type product_id: Int
+        :param product_id: the product id
+
+        :type owners: Dict
+        :param owners: producer_id -> number of units, as returned by Inventory.reserve_many
+        """
+        counts = self.products.setdefault(product_id, {})
+        for producer_id, count in owners.items():
+            counts[producer_id] = counts.get(producer_id, 0) + count
+
+    def take(self, product_id, quantity, partial=True):
+        """
+        Takes up to quantity units of the product out of the cart.
+
+        :type product_id: Int
+        :param product_id: the product id
+
+        :type quantity: Int
+        :param quantity: the number of units to take
+
+        :type partial: Boolean
+        :param partial: take the units in the cart even if there are less than quantity;
+        otherwise take either quantity units or none
+
+        :returns a dictionary producer_id -> number of units taken, empty if none
+        """
+        owners = self.products.get(product_id)
+        if not owners or (not partial and self.count(product_id) < quantity):
+            return {}
+
+        taken = take_units(owners, quantity)
+        if not owners:
+            del self.products[product_id]
+
+        if self.holds:
+            self._drop_holds(product_id, sum(taken.values()))
+
+        return taken
+
+    def hold(self, product_id, count, deadline):
+        """
+        Records that count units of the product, just added, are held until deadline.
+        The deadlines of a product's holds must not decrease.
+        """
+        self.holds.setdefault(product_id, deque()).append([deadline, count])
+
+    def expire(self, product_id, now):
+        """
+        Takes the units of the product whose holds expired by now out of the cart and
+        counts them as expired, see take_expired.
+
+        :returns a dictionary producer_id -> number of units taken, empty if none
+        """
+        holds = self.holds.get(product_id)
+        count = 0
+        while holds and holds[0][0] <= now:
+            count += holds.popleft()[1]
+
+        if not holds:
+            self.holds.pop(product_id, None)
+        if not count:
+            return {}
+
+        owners = self.products[product_id]
+        taken = take_units(owners, count)
+        if not owners:
+            del self.products[product_id]
+        self.expired[product_id] = self.expired.get(product_id, 0) + count
+
+        return taken
+
+    def take_expired(self):
+        """
+        Returns product_id -> number of units that left the cart when their holds
+        expired, since the last call, and forgets them.
+        """
+        expired, self.expired = self.expired, {}
+        return expired
+
+    def _drop_holds(self, product_id, count):
+        """
+        Forgets the holds of count units of the product that left the cart, oldest first.
+        """
+        holds = self.holds.get(product_id)
+        while holds and count:
+            dropped = min(count, holds[0][1])
+            holds[0][1] -= dropped
+            count -= dropped
+            if not holds[0][1]:
+                holds.popleft()
+
+        if holds is not None and not holds:
+            del self.holds[product_id]
+
+    def snapshot(self):
+        """
+        Returns product_id -> number of units in the cart. It can be called while the
+        owner of the cart changes it: every dictionary is copied in a single operation,
+        atomic under the GIL, before it is read.
+        """
+        return {product_id: sum(owners.copy().values())
+                for product_id, owners in self.products.copy().items()}
+
+    def count(self, product_id):
+        """
+        Returns the number of units of the product in the cart.
+        """
+        return sum(self.products.get(product_id, {}).values())
@@ -0,0 +1,97 @@
+"""
+This module represents the catalog of the products known to the Marketplace.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+from threading import Lock
+
+
+class ProductCatalog:
+    """
+    Class that interns every product to a small integer id. The Marketplace keys
+    its internal structures on these ids, so that the products are compared and
+    hashed field by field only when they are interned.
+    """
+
+    def __init__(self, products=()):
+        """
+        Constructor
+
+        :type products: Iterable
+        :param products: the products to intern right away, e.g. when loading a configuration
+        """
+
+        # product id -> the interned product
+        self.products = []
+        # product -> product id
+        self.ids = {}
+        # id() of an interned product -> product id; the catalog keeps the interned
+        # products alive, so their id() is never reused
+        self.identities = {}
+        self.lock = Lock()
+
+        for product in products:
+            self.intern(product)
+
+    def __len__(self):
+        return len(self.products)
+
+    def __getstate__(self):
+        # the ids of the instances and the lock are only meaningful in this process
+        return self.products
+
+    def __setstate__(self, products):
+        self.__init__(products)
+
+    def intern(self, product):
+        """
+        Returns the id of product, interning it first if it is new. Looking up an
+        interned product instance costs a single integer hash.
+
+        :type product: Product
+        :param product: the product
+
+        :returns the product id
+        """
+        product_id = self.lookup(product)
+        if product_id is not None:
+            return product_id
+
+        # only a new product takes the lock; it is looked up again under the lock, in
+        # case another thread interned it meanwhile
+        with self.lock:
+            product_id = self.ids.get(product)
+            if product_id is None:
+                product_id = len(self.products)
+                self.products.append(product)
+                self.ids[product] = product_id
+                self.identities[id(product)] = product_id
+
+        return product_id
+
+    def lookup(self, product):
+        """
+        Returns the id of product, or None if it was never interned. Unlike intern,
+        it does not add the product to the catalog and takes no lock: a product is
+        added to ids only after it is in products, see intern.
+        """
+        product_id = self.identities.get(id(product))
+        if product_id is None:
+            product_id = self.ids.get(product)
+
+        return product_id
+
+    def canonical(self, product):
+        """
+        Returns the interned product equal to product, interning it if it is new.
+        """
+        return self.products[self.intern(product)]
+
+    def product(self, product_id):
+        """
+        Returns the product with the given id.
+        """
+        return self.products[product_id]
@@ -0,0 +1,172 @@
+"""
+This module reads market configurations incrementally.
+
+A configuration is a JSON object with the "products", "producers", "consumers" and
+"marketplace" keys. Instead of loading it whole, the file is read in chunks and
+every producer and consumer is decoded on its own, as soon as its text is read.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import json
+
+CHUNK_SIZE = 1 << 16
+
+# the keys whose arrays are yielded element by element, and their elements' sections
+ARRAY_SECTIONS = {'producers': 'producer', 'consumers': 'consumer'}
+
+
+class JsonStream:
+    """
+    Class that decodes the JSON values of a text stream one at a time, keeping in
+    memory only the text that was read and not decoded yet.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        """
+        Constructor
+
+        :type stream: TextIO
+        :param stream: the text to decode
+
+        :type chunk_size: Int
+        :param chunk_size: the number of characters read at once
+        """
+
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def read(self, size=0):
+        """
+        Appends a chunk of the stream to the buffer, dropping the decoded text.
+
+        :type size: Int
+        :param size: the number of characters to read, if more than the chunk size
+
+        :returns False if the stream has ended
+        """
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(max(size, self.chunk_size))
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Returns the next character that is not whitespace, without consuming it,
+        or '' at the end of the stream.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+
+            if self.pos < len(self.buffer) or not self.read():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        """
+        Consumes the next character that is not whitespace, which must be one of chars.
+
+        :returns the consumed character
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"expected one of {chars!r} at {self.describe()}")
+
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decodes and consumes the next value, reading the stream until it is complete.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # every attempt decodes the value from its start, so the text of a large
+                # value is doubled before the next one, which keeps the reading linear
+                if not self.read(len(self.buffer) - self.pos):
+                    raise
+                continue
+
+            # a number that ends with the buffer may continue in the next chunk
+            if end < len(self.buffer) or not self.read():
+                self.pos = end
+                return value
+
+    def items(self):
+        """
+        Consumes the opening brace of an object and yields its keys; the caller
+        must consume the value of every key before asking for the next one.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def elements(self):
+        """
+        Consumes an array and yields its values, decoding each of them when asked for.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def describe(self):
+        """
+        Returns a short excerpt of the text around the current position.
+        """
+        return repr(self.buffer[self.pos:self.pos + 20])
+
+
+def iter_config(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yields the sections of a market configuration, in the order of the file, as
+    (section, value) pairs: ("producer", config) for every producer, ("consumer", config)
+    for every consumer and (key, value) for the other keys, such as "products" and
+    "marketplace".
+
+    :type stream: TextIO
+    :param stream: the configuration file
+
+    :type chunk_size: Int
+    :param chunk_size: the number of characters read at once
+    """
+    json_stream = JsonStream(stream, chunk_size)
+    for key in json_stream.items():
+        section = ARRAY_SECTIONS.get(key)
+        if section is None:
+            yield key, json_stream.value()
+        else:
+            for element in json_stream.elements():
+                yield section, element
+
+    if json_stream.peek():
+        raise ValueError(f"unexpected text after the configuration at {json_stream.describe()}")
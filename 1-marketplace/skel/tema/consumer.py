@@ -8,6 +8,7 @@ March 2021
 
 import time
 from threading import Thread
+from tema.cart import HoldExpired
 
 
 class Consumer(Thread):
@@ -26,8 +27,8 @@ class Consumer(Thread):
         :param marketplace: a reference to the marketplace
 
         :type retry_wait_time: Time
-        :param retry_wait_time: the number of seconds that a producer must wait
-        until the Marketplace becomes available
+        :param retry_wait_time: the maximum number of seconds that a consumer waits
+        for a product to become available before trying again
 
         :type kwargs:
         :param kwargs: other arguments that are passed to the Thread's __init__()
@@ -40,21 +41,75 @@ class Consumer(Thread):
         self.retry_wait_time = retry_wait_time
 
     def run(self):
-        for i in range(len(self.carts)):
+        for cart in self.carts:
             cart_id = self.marketplace.new_cart()
 
-            for j in self.carts[i]:
-                count=0
+            for j in cart:
+                if j["type"] == "remove":
+                    self.remove(cart_id, j["product"], int(j["quantity"]))
+                else:
+                    self.add(cart_id, j["product"], int(j["quantity"]))
 
-                while count < int(j["quantity"]):
-                    if j["type"] == "remove":
-                        out = self.marketplace.remove_from_cart(cart_id,j["product"])
-                    else:
-                        out = self.marketplace.add_to_cart(cart_id,j["product"])
+            while True:
+                try:
+                    self.marketplace.place_order(cart_id)
+                    break
+                except HoldExpired as expired:
+                    self.add_again(cart_id, expired.units)
 
-                    if out is None or out:
-                        count +=1
-                    else:
-                        time.sleep(self.retry_wait_time)
+        self.marketplace.flush_orders()
 
-            self.marketplace.place_order(cart_id)
+    def add(self, cart_id, product, count):
+        """
+        Adds count units of the product to the cart, waiting until they are available.
+        """
+        metrics = self.marketplace.metrics
+        # a fair marketplace hands the units off in order, the consumer keeps its place
+        # in the queue instead of leaving it to retry
+        add_timeout = None if self.marketplace.fair else self.retry_wait_time
+        requested = time.monotonic()
+
+        while count > 0:
+            start = time.monotonic()
+            # takes as many units as available in one call, waiting for the product
+            # instead of sleeping blindly
+            out = self.marketplace.add_many(cart_id, product, count, timeout=add_timeout)
+            if out == 0 and metrics is not None:
+                metrics.retried('consumer', time.monotonic() - start)
+            count -= out
+
+        if metrics is not None:
+            metrics.waited(self.name, time.monotonic() - requested)
+
+    def remove(self, cart_id, product, count):
+        """
+        Removes count units of the product from the cart. The units whose holds expired
+        are added again first, so that they can be removed.
+        """
+        metrics = self.marketplace.metrics
+
+        while count > 0:
+            start = time.monotonic()
+            out = self.marketplace.remove_many(cart_id, product, count)
+            expired = {}
+            if out < count and self.marketplace.hold_ttl is not None:
+                expired = self.marketplace.take_expired(cart_id)
+
+            if expired:
+                self.add_again(cart_id, expired)
+            elif out == 0:
+                time.sleep(self.retry_wait_time)
+
+            if out == 0 and metrics is not None:
+                metrics.retried('consumer', time.monotonic() - start)
+            count -= out
+
+    def add_again(self, cart_id, units):
+        """
+        Adds again the units that left the cart when their holds expired.
+
+        :type units: Dict
+        :param units: Product -> number of units, see HoldExpired
+        """
+        for product, count in units.items():
+            self.add(cart_id, product, count)
@@ -0,0 +1,15 @@
+"""
+This module names the engines that run the producers and consumers: 'threads' runs
+them as threads over a Marketplace, 'asyncio' as tasks over an AsyncMarketplace,
+'processes' as threads spread over worker processes, each with a SharedMarketplace,
+and 'simulation' as asyncio tasks on a virtual clock.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+ENGINES = ('threads', 'asyncio', 'processes', 'simulation')
+DEFAULT_ENGINE = 'threads'
+# the engines whose Marketplace methods are coroutines
+ASYNC_ENGINES = ('asyncio', 'simulation')
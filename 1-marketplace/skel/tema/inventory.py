@@ -0,0 +1,307 @@
+"""
+This module represents the Marketplace's inventory index.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+from threading import Lock
+
+DEFAULT_STRIPES = 64
+
+
+def take_units(owners, quantity):
+    """
+    Takes up to quantity units out of a producer_id -> number of units dictionary,
+    oldest producers first.
+
+    :type owners: Dict
+    :param owners: the units of a product, by producer; emptied producers are removed
+
+    :type quantity: Int
+    :param quantity: the maximum number of units to take
+
+    :returns a dictionary producer_id -> number of units taken from it
+    """
+    taken = {}
+    while quantity and owners:
+        producer_id = next(iter(owners))
+        count = min(quantity, owners[producer_id])
+        if count == owners[producer_id]:
+            del owners[producer_id]
+        else:
+            owners[producer_id] -= count
+
+        taken[producer_id] = count
+        quantity -= count
+
+    return taken
+
+
+def new_lock(name):  # pylint: disable=unused-argument
+    """
+    Returns a new lock. The name tells what the lock guards, for the factories
+    that instrument their locks, see Metrics.new_lock.
+    """
+    return Lock()
+
+
+class Inventory:
+    """
+    Class that indexes the published products by product id, so that looking up,
+    reserving and releasing a unit are O(1) operations.
+
+    Every producer's queue is a bounded counter of the units it has in the inventory,
+    and the stock is the per-product view across the queues: for every product, the
+    producers that have units of it and how many. The memory is therefore bounded by
+    the number of producers and of distinct (product, producer) pairs, whatever the
+    number of published units.
+
+    The totals are a read-optimized view of the stock, written in the same critical
+    section as it: reading a product's total or copying them all is a single dictionary
+    operation, atomic under the GIL, so the readers do not take the writers' locks.
+
+    The inventory is not thread-safe, the Marketplace serializes the access to it.
+    """
+
+    def __init__(self, queue_size_per_producer):
+        """
+        Constructor
+
+        :type queue_size_per_producer: Int
+        :param queue_size_per_producer: the maximum size of a queue associated with each producer
+        """
+
+        self.queue_size_per_producer = queue_size_per_producer
+        # producer_id -> number of units the producer currently has in the marketplace
+        self.producer_queue = {}
+        # product_id -> {producer_id: number of available units}
+        self.stock = {}
+        # product_id -> number of available units, from all the producers
+        self.totals = {}
+
+    def add_producer(self, producer_id):
+        """
+        Creates an empty queue for a new producer.
+
+        :type producer_id: Int
+        :param producer_id: the id of the new producer
+        """
+        self.producer_queue[producer_id] = 0
+
+    def put(self, producer_id, product_id):
+        """
+        Adds a unit of the product on behalf of the producer, if its queue is not full.
+
+        :type producer_id: Int
+        :param producer_id: producer id
+
+        :type product_id: Int
+        :param product_id: the id of the published product
+
+        :returns True or False. False means that the producer's queue is full.
+        """
+        if not self._occupy(producer_id, bounded=True):
+            return False
+
+        self._add_unit(producer_id, product_id)
+        return True
+
+    def put_many(self, producer_id, product_id, quantity):
+        """
+        Adds up to quantity units of the product on behalf of the producer, as many as
+        fit in its queue.
+
+        :type producer_id: Int
+        :param producer_id: producer id
+
+        :type product_id: Int
+        :param product_id: the id of the published product
+
+        :type quantity: Int
+        :param quantity: the number of units to add
+
+        :returns the number of added units, 0 if the producer's queue is full
+        """
+        count = self._occupy_room(producer_id, quantity)
+        if count:
+            self._add_unit(producer_id, product_id, count)
+
+        return count
+
+    def reserve(self, product_id):
+        """
+        Takes an available unit of the product out of the inventory.
+
+        :type product_id: Int
+        :param product_id: the id of the requested product
+
+        :returns the id of the producer that owns the unit or None if there is no unit available
+        """
+        return next(iter(self.reserve_many(product_id, 1)), None)
+
+    def reserve_many(self, product_id, quantity, partial=True):
+        """
+        Takes up to quantity units of the product out of the inventory, oldest producers first.
+
+        :type product_id: Int
+        :param product_id: the id of the requested product
+
+        :type quantity: Int
+        :param quantity: the number of requested units
+
+        :type partial: Boolean
+        :param partial: take the available units even if there are less than quantity;
+        otherwise take either quantity units or none
+
+        :returns a dictionary producer_id -> number of units taken from it, empty if none
+        """
+        taken = self._take_units(product_id, quantity, partial)
+        for producer_id, count in taken.items():
+            self._vacate(producer_id, count)
+
+        return taken
+
+    def release(self, producer_id, product_id, count=1):
+        """
+        Puts back units of the product previously taken with reserve.
+
+        :type producer_id: Int
+        :param producer_id: the producer that owns the units
+
+        :type product_id: Int
+        :param product_id: the id of the released product
+
+        :type count: Int
+        :param count: the number of released units
+        """
+        self._occupy(producer_id, bounded=False, count=count)
+        self._add_unit(producer_id, product_id, count)
+
+    def available(self, product_id):
+        """
+        Returns the number of units of the product that can be reserved.
+
+        :type product_id: Int
+        :param product_id: the product id
+        """
+        return self.totals.get(product_id, 0)
+
+    def snapshot(self):
+        """
+        Returns a copy of the totals, product_id -> number of available units, without
+        the products that have none. No lock is taken, see the class documentation.
+        """
+        return {product_id: count for product_id, count in self.totals.copy().items() if count}
+
+    def _stock_for(self, product_id):  # pylint: disable=unused-argument
+        """
+        Returns the product_id -> owners dictionary that holds the product.
+        """
+        return self.stock
+
+    def _occupy(self, producer_id, bounded, count=1):
+        """
+        Counts count more units in the producer's queue. When bounded is set, the units
+        are refused if they do not fit in the queue.
+        """
+        if bounded and self.producer_queue[producer_id] + count > self.queue_size_per_producer:
+            return False
+
+        self.producer_queue[producer_id] += count
+        return True
+
+    def _occupy_room(self, producer_id, quantity):
+        """
+        Counts up to quantity more units in the producer's queue, as many as fit.
+
+        :returns the number of counted units
+        """
+        count = min(quantity, self.queue_size_per_producer - self.producer_queue[producer_id])
+        if count <= 0:
+            return 0
+
+        self.producer_queue[producer_id] += count
+        return count
+
+    def _vacate(self, producer_id, count=1):
+        """
+        Counts count less units in the producer's queue.
+        """
+        self.producer_queue[producer_id] -= count
+
+    def _add_unit(self, producer_id, product_id, count=1):
+        """
+        Makes count units of the product owned by producer_id available.
+        """
+        owners = self._stock_for(product_id).setdefault(product_id, {})
+        owners[producer_id] = owners.get(producer_id, 0) + count
+        self.totals[product_id] = self.totals.get(product_id, 0) + count
+
+    def _take_units(self, product_id, quantity, partial):
+        """
+        Removes up to quantity available units of the product, see reserve_many.
+        """
+        owners = self._stock_for(product_id).get(product_id)
+        if not owners or (not partial and self.totals[product_id] < quantity):
+            return {}
+
+        taken = take_units(owners, quantity)
+        self.totals[product_id] -= sum(taken.values())
+        return taken
+
+
+class StripedInventory(Inventory):
+    """
+    Thread-safe inventory that uses one lock per producer queue counter and one lock
+    per stripe of products, so that operations on unrelated products and producers
+    do not contend with each other.
+    """
+
+    def __init__(self, queue_size_per_producer, stripes=DEFAULT_STRIPES, lock_factory=new_lock):
+        """
+        Constructor
+
+        :type queue_size_per_producer: Int
+        :param queue_size_per_producer: the maximum size of a queue associated with each producer
+
+        :type stripes: Int
+        :param stripes: the number of product stripes (hash buckets), each with its own lock
+
+        :type lock_factory: Callable
+        :param lock_factory: returns a new lock given its name, 'producer' or 'stripe'
+        """
+
+        super().__init__(queue_size_per_producer)
+        self.lock_factory = lock_factory
+        self.producer_locks = {}
+        # every stripe owns a separate product_id -> owners dictionary, guarded by its lock
+        self.stripes = [({}, lock_factory('stripe')) for _ in range(stripes)]
+
+    def add_producer(self, producer_id):
+        self.producer_locks[producer_id] = self.lock_factory('producer')
+        super().add_producer(producer_id)
+
+    def _stock_for(self, product_id):
+        return self.stripes[product_id % len(self.stripes)][0]
+
+    def _occupy(self, producer_id, bounded, count=1):
+        with self.producer_locks[producer_id]:
+            return super()._occupy(producer_id, bounded, count)
+
+    def _occupy_room(self, producer_id, quantity):
+        with self.producer_locks[producer_id]:
+            return super()._occupy_room(producer_id, quantity)
+
+    def _vacate(self, producer_id, count=1):
+        with self.producer_locks[producer_id]:
+            super()._vacate(producer_id, count)
+
+    def _add_unit(self, producer_id, product_id, count=1):
+        with self.stripes[product_id % len(self.stripes)][1]:
+            super()._add_unit(producer_id, product_id, count)
+
+    def _take_units(self, product_id, quantity, partial):
+        with self.stripes[product_id % len(self.stripes)][1]:
+            return super()._take_units(product_id, quantity, partial)
@@ -0,0 +1,176 @@
+"""
+This module configures the Marketplace's logging.
+
+Nothing is logged until configure_logging is called; in the 'queue' and 'aggregate'
+modes the callers only enqueue the records and a background thread writes them in
+batches, so that the Marketplace methods never wait for the log file.
+
+Only the logging module itself is imported, not logging.handlers and the socket and
+pickle modules it pulls in, so that importing the Marketplace stays cheap.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import logging
+from collections import Counter
+from queue import Empty, SimpleQueue
+from threading import Thread
+
+LOGGER_NAME = 'logger'
+LOG_MODES = ('off', 'sync', 'queue', 'aggregate')
+DEFAULT_BATCH_SIZE = 512
+
+# put in the queue to stop the listener
+_STOP = None
+
+
+class RecordQueueHandler(logging.Handler):
+    """
+    Handler that puts the records in a queue, as they are.
+
+    The Marketplace's messages have no arguments, so the records are not formatted
+    in the caller's thread, and the handler's lock is not taken since the queue is
+    thread-safe.
+    """
+
+    def __init__(self, record_queue):
+        logging.Handler.__init__(self)
+        self.queue = record_queue
+
+    def handle(self, record):
+        self.queue.put(record)
+        return True
+
+    def emit(self, record):
+        self.queue.put(record)
+
+
+class BatchListener(Thread):
+    """
+    Thread that takes the records out of the queue in batches and writes each batch
+    to the log file with a single write and flush.
+    """
+
+    def __init__(self, record_queue, filename, batch_size=DEFAULT_BATCH_SIZE,
+                 sample_every=1, aggregate=False):
+        """
+        Constructor
+
+        :type record_queue: SimpleQueue
+        :param record_queue: the queue filled by the RecordQueueHandler
+
+        :type filename: String
+        :param filename: the log file, opened for appending
+
+        :type batch_size: Int
+        :param batch_size: the maximum number of records written at once
+
+        :type sample_every: Int
+        :param sample_every: only one in every sample_every calls of a method is written
+
+        :type aggregate: Boolean
+        :param aggregate: write only the number of calls of every method, when stopped
+        """
+
+        Thread.__init__(self, name='marketplace-log', daemon=True)
+
+        self.queue = record_queue
+        self.filename = filename
+        self.batch_size = batch_size
+        self.sample_every = sample_every
+        self.aggregate = aggregate
+        # message -> number of records received
+        self.counts = Counter()
+
+    def run(self):
+        with open(self.filename, 'a', encoding='utf-8') as log_file:
+            running = True
+            while running:
+                batch = [self.queue.get()]
+                try:
+                    while len(batch) < self.batch_size:
+                        batch.append(self.queue.get_nowait())
+                except Empty:
+                    pass
+
+                lines = []
+                for record in batch:
+                    if record is _STOP:
+                        running = False
+                        continue
+
+                    message = record.getMessage()
+                    self.counts[message] += 1
+                    if not self.aggregate and (self.counts[message] - 1) % self.sample_every == 0:
+                        lines.append(message)
+
+                if not running and (self.aggregate or self.sample_every > 1):
+                    lines.extend(f'{message}: {count} calls'
+                                 for message, count in sorted(self.counts.items()))
+
+                if lines:
+                    log_file.write('\n'.join(lines) + '\n')
+                    log_file.flush()
+
+    def stop(self):
+        """
+        Writes the records that are still in the queue and stops the thread.
+        """
+        self.queue.put(_STOP)
+        self.join()
+
+
+def configure_logging(mode='queue', filename='marketplace.log',
+                      batch_size=DEFAULT_BATCH_SIZE, sample_every=1):
+    """
+    Attaches a handler to the Marketplace's logger.
+
+    :type mode: String
+    :param mode: 'off' logs nothing, 'sync' writes every record from the caller's thread,
+    'queue' writes the records in batches from a background thread and 'aggregate'
+    only counts the calls of every method
+
+    :type filename: String
+    :param filename: the log file
+
+    :type batch_size: Int
+    :param batch_size: the maximum number of records written at once by the background thread
+
+    :type sample_every: Int
+    :param sample_every: in the 'queue' mode, only one in every sample_every calls of a
+    method is written, followed by the number of calls
+
+    :returns a function that flushes the log and detaches the handler
+    """
+    if mode not in LOG_MODES:
+        raise ValueError(f"unknown logging mode: {mode}")
+
+    logger = logging.getLogger(LOGGER_NAME)
+
+    if mode == 'off':
+        logger.setLevel(logging.WARNING)
+        return lambda: None
+
+    logger.setLevel(logging.INFO)
+
+    if mode == 'sync':
+        # appends to the log, that is never rolled over
+        handler = logging.FileHandler(filename)
+        listener = None
+    else:
+        record_queue = SimpleQueue()
+        handler = RecordQueueHandler(record_queue)
+        listener = BatchListener(record_queue, filename, batch_size, sample_every,
+                                 aggregate=mode == 'aggregate')
+        listener.start()
+    logger.addHandler(handler)
+
+    def shutdown():
+        logger.removeHandler(handler)
+        handler.close()
+        if listener is not None:
+            listener.stop()
+
+    return shutdown
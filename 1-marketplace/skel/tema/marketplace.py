@@ -5,43 +5,95 @@ Computer Systems Architecture Course
 Assignment 1
 March 2021
 """
-from threading import Lock
-import unittest
+from contextlib import nullcontext
+from threading import Condition
+import functools
+import heapq
+import time
 import threading
-import logging
-from logging.handlers import RotatingFileHandler
-from tema.product import Product, Tea
+from tema.base_marketplace import BaseMarketplace, logger
+from tema.cart import Cart, HoldExpired
+from tema.inventory import DEFAULT_STRIPES, Inventory, StripedInventory, new_lock
+from tema import opcodes as ops
+from tema.waiters import WaiterQueue
 
-logger = logging.getLogger('logger')
-logger.setLevel(logging.INFO)
-handler = RotatingFileHandler('marketplace.log', maxBytes=0, backupCount=10)
-logger.addHandler(handler)
 
-
-class Marketplace:
+class Marketplace(BaseMarketplace):
     """
     Class that represents the Marketplace. It's the central part of the implementation.
     The producers and consumers use its methods concurrently.
     """
 
-    def __init__(self, queue_size_per_producer):
+    def __init__(self, queue_size_per_producer, *, locking='global', stripes=DEFAULT_STRIPES,
+                 order_sink=None, catalog=None, metrics=None, hold_ttl=None,
+                 fair=False, trace=None):
         """
         Constructor
 
         :type queue_size_per_producer: Int
         :param queue_size_per_producer: the maximum size of a queue associated with each producer
+
+        :type locking: String
+        :param locking: 'global' to guard the inventory with a single lock or 'striped'
+        to use a lock per producer queue and per stripe of products
+
+        :type stripes: Int
+        :param stripes: the number of product stripes used by the 'striped' locking
+
+        :type order_sink: OrderSink
+        :param order_sink: where the placed orders are written, stdout by default
+
+        :type catalog: ProductCatalog
+        :param catalog: the catalog that interns the products, usually filled when the
+        configuration is loaded; new products are added to it when first seen
+
+        :type metrics: Metrics
+        :param metrics: gathers the lock timings and the rejected attempts; None
+        turns the instrumentation off
+
+        :type hold_ttl: Float
+        :param hold_ttl: the number of seconds that the units added to a cart stay in it;
+        the units of a cart that is not ordered in time go back to the inventory, and
+        place_order raises HoldExpired until they are added again. None keeps them
+        until the cart is ordered
+
+        :type fair: Boolean
+        :param fair: hand off the units of a product to the consumers that wait for it
+        in the order they started waiting, see WaiterQueue; otherwise the waiters are
+        woken up and race for the units with the consumers that just arrived
+
+        :type trace: TraceRecorder
+        :param trace: records every call, with its arguments and result; None records nothing
         """
 
-        self.queue_size_per_producer = queue_size_per_producer
-        self.return_producer_id = Lock()
-        self.producer_queue = []
-        self.products = []
-        self.producers_dic = {}
-        self.create_new_cart = Lock()
-        self.modify_cart = Lock()
-        self.cart_count = 0
-        self.cart_dic = {}
-        self.print_mutex = Lock()
+        lock_factory = new_lock if metrics is None else metrics.new_lock
+        if locking == 'global':
+            super().__init__(queue_size_per_producer, Inventory(queue_size_per_producer),
+                             order_sink, catalog)
+            self.modify_cart = lock_factory('modify_cart')
+        elif locking == 'striped':
+            # the inventory takes its own fine-grained locks
+            super().__init__(queue_size_per_producer,
+                             StripedInventory(queue_size_per_producer, stripes, lock_factory),
+                             order_sink, catalog)
+        else:
+            raise ValueError(f"unknown locking mode: {locking}")
+
+        self.metrics = metrics
+        self.hold_ttl = hold_ttl
+        # heap of (deadline, cart_id, product_id), one for every hold; the holds that
+        # left the cart before their deadline are skipped when popped
+        self.hold_deadlines = []
+        # guards the heap and the carts, that expiring holds change from any thread
+        self.hold_lock = lock_factory('hold_lock') if hold_ttl is not None else nullcontext()
+        # expires the holds when their deadline passes, even if nobody calls the
+        # Marketplace; there is a single timer, for the earliest deadline
+        self.expiry_timer = None
+
+        self.fair = fair
+        # product id -> the queue of the consumers waiting for the product, when fair
+        self.waiter_queues = {}
+        self.trace = trace
 
     def register_producer(self):
         """
@@ -49,11 +101,13 @@ class Marketplace:
         """
         logger.info('register_producer')
 
-        with self.return_producer_id:
-            self.producer_queue.append(0)
-            return len(self.producer_queue)-1
+        producer_id = self._new_producer()
+        if self.trace is not None:
+            self.trace.record(ops.REGISTER_PRODUCER, producer_id, -1, 0, producer_id)
+
+        return producer_id
 
-    def publish(self, producer_id, product):
+    def publish(self, producer_id, product, timeout=0):
         """
         Adds the product provided by the producer to the marketplace
 
@@ -63,21 +117,48 @@ class Marketplace:
         :type product: Product
         :param product: the Product that will be published in the Marketplace
 
+        :type timeout: Float
+        :param timeout: the number of seconds to wait for room in the producer's queue;
+        0 returns at once and None waits until there is room
+
         :returns True or False. If the caller receives False, it should wait and then try again.
         """
 
-        prod_id = int(producer_id)
-
-        if self.producer_queue[prod_id] >= self.queue_size_per_producer:
+        added = self._publish(int(producer_id), product, 1, timeout)
+        self._trace(ops.PUBLISH, int(producer_id), product, 1, added)
+        if added == 0:
             return False
 
-        self.producer_queue[prod_id] += 1
-        self.products.append(product)
-        self.producers_dic[product] = prod_id
         logger.info('publish')
 
         return True
 
+    def publish_many(self, producer_id, product, quantity, timeout=0):
+        """
+        Adds up to quantity units of the product provided by the producer, as many as
+        fit in the producer's queue, in a single critical section.
+
+        :type producer_id: Int
+        :param producer_id: producer id
+
+        :type product: Product
+        :param product: the Product that will be published in the Marketplace
+
+        :type quantity: Int
+        :param quantity: the maximum number of units to add
+
+        :type timeout: Float
+        :param timeout: the number of seconds to wait for room for at least a unit;
+        0 returns at once and None waits until there is room
+
+        :returns the number of added units
+        """
+        logger.info('publish_many')
+
+        added = self._publish(producer_id, product, quantity, timeout)
+        self._trace(ops.PUBLISH_MANY, producer_id, product, quantity, added)
+        return added
+
     def new_cart(self):
         """
         Creates a new cart for the consumer
@@ -86,16 +167,15 @@ class Marketplace:
         """
         logger.info('new_cart')
 
-        with self.create_new_cart:
-            self.cart_count += 1
-            cart_id = self.cart_count
+        cart_id = self.cart_dic.add(Cart())
+        if self.trace is not None:
+            self.trace.record(ops.NEW_CART, cart_id, -1, 0, cart_id)
 
-        self.cart_dic[cart_id] = []
         return cart_id
 
-    def add_to_cart(self, cart_id, product):
+    def add_to_cart(self, cart_id, product, quantity=1, timeout=0):
         """
-        Adds a product to the given cart. The method returns
+        Adds quantity units of a product to the given cart, all of them or none.
 
         :type cart_id: Int
         :param cart_id: id cart
@@ -103,47 +183,89 @@ class Marketplace:
         :type product: Product
         :param product: the product to add to cart
 
+        :type quantity: Int
+        :param quantity: the number of units to add
+
+        :type timeout: Float
+        :param timeout: the number of seconds to wait for the product to become available;
+        0 returns at once and None waits until it is available
+
         :returns True or False. If the caller receives False, it should wait and then try again
         """
         logger.info('add_to_cart')
 
-        with self.modify_cart:
-            check = False
+        added = self._add(cart_id, product, quantity, False, timeout) == quantity
+        self._trace(ops.ADD_TO_CART, cart_id, product, quantity, added)
+        return added
 
-            for i in range(len(self.products)):
-                if self.products[i] == product:
-                    check = True
+    def add_many(self, cart_id, product, quantity, timeout=0):
+        """
+        Adds up to quantity units of a product to the given cart, as many as available.
 
-            if check is False:
-                return check
+        :type cart_id: Int
+        :param cart_id: id cart
 
-            self.producer_queue[self.producers_dic[product]] -= 1
-            self.products.remove(product)
+        :type product: Product
+        :param product: the product to add to cart
 
-        self.cart_dic[cart_id].append(product)
-        return True
+        :type quantity: Int
+        :param quantity: the maximum number of units to add
+
+        :type timeout: Float
+        :param timeout: the number of seconds to wait for at least a unit to become available;
+        0 returns at once and None waits until one is available
+
+        :returns the number of added units
+        """
+        logger.info('add_many')
+
+        added = self._add(cart_id, product, quantity, True, timeout)
+        self._trace(ops.ADD_MANY, cart_id, product, quantity, added)
+        return added
 
-    def remove_from_cart(self, cart_id, product):
+    def remove_from_cart(self, cart_id, product, quantity=1):
         """
-        Removes a product from cart.
+        Removes quantity units of a product from cart, all of them or none.
 
         :type cart_id: Int
         :param cart_id: id cart
 
         :type product: Product
         :param product: the product to remove from cart
+
+        :type quantity: Int
+        :param quantity: the number of units to remove
+
+        :returns True or False. False means that the cart has less than quantity units
         """
 
         logger.info('remove_from_cart')
 
-        try:
-            with self.modify_cart:
-                self.cart_dic[cart_id].remove(product)
-                self.producer_queue.append(product)
-                self.producer_queue[self.producers_dic[product]] += 1
-                return True
-        except NameError:
-            return False
+        removed = self._remove(cart_id, product, quantity, False) == quantity
+        self._trace(ops.REMOVE_FROM_CART, cart_id, product, quantity, removed)
+        return removed
+
+    def remove_many(self, cart_id, product, quantity):
+        """
+        Removes up to quantity units of a product from cart, as many as the cart has.
+
+        :type cart_id: Int
+        :param cart_id: id cart
+
+        :type product: Product
+        :param product: the product to remove from cart
+
+        :type quantity: Int
+        :param quantity: the maximum number of units to remove
+
+        :returns the number of removed units
+        """
+
+        logger.info('remove_many')
+
+        removed = self._remove(cart_id, product, quantity, True)
+        self._trace(ops.REMOVE_MANY, cart_id, product, quantity, removed)
+        return removed
 
     def place_order(self, cart_id):
         """
@@ -151,73 +273,257 @@ class Marketplace:
 
         :type cart_id: Int
         :param cart_id: id cart
+
+        Raises HoldExpired, without ordering the cart, when some of its units went back
+        to the inventory because their holds expired.
         """
 
         logger.info('place_order')
-        for prod in self.cart_dic.pop(cart_id, None):
-            with self.print_mutex:
-                print(f"{threading.current_thread().name} bought {prod}")
+        self._expire_holds()
+        with self.hold_lock:
+            cart = self.cart_dic.get(cart_id)
+            expired = cart.take_expired() if cart is not None else None
+            if not expired:
+                self.cart_dic.pop(cart_id, None)
+        if expired:
+            raise HoldExpired(self._products(expired))
+
+        self.order_sink.write_order(threading.current_thread().name,
+                                    (self.catalog.product(product_id) for product_id in cart))
+        if self.trace is not None:
+            self.trace.record(ops.PLACE_ORDER, cart_id, -1, 0, len(cart))
 
         return self.cart_dic.pop(cart_id, None)
 
+    def take_expired(self, cart_id):
+        """
+        Returns the units that left the cart because their holds expired, since the
+        last call, so that its owner can add them again.
 
-class TestMarketplace(unittest.TestCase):
-    """Test marketplace."""
-
-    def setUp(self):
-        self.obj = Marketplace(3)
-
-        self.pro_1 = Product('Wild Cherry', '5')
-        self.tea_1 = Tea(self.pro_1, 'Black', '5')
-        self.pro_2 = Product('Cactus fig', '3')
-        self.tea_2 = Tea(self.pro_2, 'Green', '3')
-        self.list = []
-        self.list.append(self.tea_1)
-        self.list.append(self.tea_2)
-
-    def test_register_producer(self):
-        """Register producer test."""
-        self.assertEqual(self.obj.register_producer(), 0)
-        self.assertEqual(self.obj.register_producer(), 1)
-        self.assertEqual(self.obj.register_producer(), 2)
-
-    def test_publish(self):
-        """Publish product test."""
-        self.obj.register_producer()
-        self.assertEqual(self.obj.publish(0, self.pro_1), True)
-
-    def test_new_cart(self):
-        """Create new cart test."""
-        self.assertEqual(self.obj.new_cart(), 1)
-        self.assertEqual(self.obj.new_cart(), 2)
-
-    def test_add_to_cart(self):
-        """Add to cart test."""
-        self.obj.register_producer()
-        self.obj.publish(0, self.pro_1)
-        self.assertEqual(self.obj.new_cart(), 1)
-        self.assertEqual(self.obj.new_cart(), 2)
-        self.assertEqual(self.obj.add_to_cart(1, self.pro_1), True)
-        self.assertEqual(self.obj.add_to_cart(1, self.pro_2), False)
-
-    def test_remove_from_cart(self):
-        """Remove from cart test."""
-        self.obj.register_producer()
-        self.obj.publish(0, self.pro_1)
-        self.assertEqual(self.obj.new_cart(), 1)
-        self.assertEqual(self.obj.new_cart(), 2)
-        self.assertEqual(self.obj.add_to_cart(1, self.pro_1), True)
-        self.assertEqual(self.obj.remove_from_cart(1, self.pro_1), True)
-        self.assertEqual(self.obj.remove_from_cart(5, self.pro_1), False)
-
-    def test_place_order(self):
-        """Place order test."""
-        self.obj.register_producer()
-        self.obj.publish(0, self.pro_1)
-        self.assertEqual(self.obj.new_cart(), 1)
-        self.assertEqual(self.obj.add_to_cart(1, self.pro_1), True)
-        self.assertEqual(self.obj.place_order(1), None)
-
-
-if __name__ == '__main__':
-    unittest.main()
+        :type cart_id: Int
+        :param cart_id: id cart
+
+        :returns a dictionary Product -> number of units, empty if there is no such cart
+        """
+        cart = self.cart_dic.get(cart_id)
+        if cart is None:
+            return {}
+
+        with self.hold_lock:
+            return self._products(cart.take_expired())
+
+    def _trace(self, operation, owner, product, quantity, result):
+        """
+        Records a call of a product operation, if the Marketplace is traced.
+        """
+        if self.trace is not None:
+            self.trace.record(operation, owner, self.catalog.intern(product), quantity,
+                              int(result))
+
+    def _publish(self, producer_id, product, quantity, timeout):
+        """
+        Adds up to quantity units of product to the producer's queue and lets the
+        consumers that wait for it know.
+
+        :returns the number of added units
+        """
+        product_id = self.catalog.intern(product)
+        self._expire_holds()
+
+        count = self._wait_for(self.space_available[producer_id],
+                               lambda: self._put(producer_id, product_id, quantity) or None,
+                               timeout)
+        if count is None:
+            if self.metrics is not None:
+                self.metrics.rejected('publish', product_id, producer_id)
+            return 0
+
+        self._units_available(product_id, count)
+        return count
+
+    def _add(self, cart_id, product, quantity, partial, timeout):
+        """
+        Reserves up to quantity units of product in a single critical section and puts
+        them in the cart, see Inventory.reserve_many.
+
+        :returns the number of added units
+        """
+        product_id = self.catalog.intern(product)
+        self._expire_holds()
+
+        if self.fair:
+            owners = self._waiter_queue(product_id).wait(quantity, partial, timeout)
+        else:
+            owners = self._wait_for(
+                self._item_condition(product_id),
+                lambda: self._reserve(product_id, quantity, partial) or None, timeout)
+        if owners is None:
+            if self.metrics is not None:
+                self.metrics.rejected('add', product_id)
+            return 0
+
+        # the cart remembers the owners, so that a removal gives the units back to them
+        cart = self.cart_dic[cart_id]
+        if self.hold_ttl is None:
+            cart.add(product_id, owners)
+        else:
+            deadline = time.monotonic() + self.hold_ttl
+            with self.hold_lock:
+                cart.add(product_id, owners)
+                cart.hold(product_id, sum(owners.values()), deadline)
+                heapq.heappush(self.hold_deadlines, (deadline, cart_id, product_id))
+                self._arm_expiry()
+        for prod_id, count in owners.items():
+            self._notify(self.space_available[prod_id], count)
+
+        return sum(owners.values())
+
+    def _remove(self, cart_id, product, quantity, partial):
+        """
+        Takes up to quantity units of product out of the cart and gives them back to
+        their producers. When partial is not set, either quantity units are removed or none.
+
+        :returns the number of removed units
+        """
+        product_id = self.catalog.intern(product)
+        self._expire_holds()
+        owners = self._take(cart_id, product_id, quantity, partial)
+        if not owners:
+            return 0
+
+        return self._release(product_id, owners)
+
+    def _release(self, product_id, owners):
+        """
+        Gives units of product back to their producers and wakes up as many waiters.
+
+        :type owners: Dict
+        :param owners: producer_id -> number of units, taken out of a cart
+
+        :returns the number of released units
+        """
+        released = self._give_back(product_id, owners)
+        self._units_available(product_id, released)
+        return released
+
+    def _expire_holds(self):
+        """
+        Gives back the units whose holds expired, earliest deadline first.
+        """
+        deadlines = self.hold_deadlines
+        try:
+            # peeks without the lock, another thread may empty the heap meanwhile
+            if deadlines[0][0] > time.monotonic():
+                return
+        except IndexError:
+            return
+
+        expired = []
+        with self.hold_lock:
+            now = time.monotonic()
+            while deadlines and deadlines[0][0] <= now:
+                _, cart_id, product_id = heapq.heappop(deadlines)
+                cart = self.cart_dic.get(cart_id)
+                owners = cart.expire(product_id, now) if cart is not None else None
+                if owners:
+                    expired.append((product_id, owners))
+
+        # the waiters are woken up without holding the lock, see _wait_for
+        for product_id, owners in expired:
+            self._release(product_id, owners)
+
+    def _arm_expiry(self):
+        """
+        Starts the timer that expires the holds at the earliest deadline, unless it
+        already runs. Must be called with hold_lock held.
+        """
+        if self.expiry_timer is not None or not self.hold_deadlines:
+            return
+
+        delay = max(0, self.hold_deadlines[0][0] - time.monotonic())
+        self.expiry_timer = threading.Timer(delay, self._on_expiry)
+        # the pending holds do not keep the program alive
+        self.expiry_timer.daemon = True
+        self.expiry_timer.start()
+
+    def _on_expiry(self):
+        """
+        Expires the holds whose deadline passed and starts the timer for the next one.
+        """
+        with self.hold_lock:
+            self.expiry_timer = None
+        self._expire_holds()
+        with self.hold_lock:
+            self._arm_expiry()
+
+    def _products(self, counts):
+        """
+        Returns Product -> count for product_id -> count.
+        """
+        return {self.catalog.product(product_id): count for product_id, count in counts.items()}
+
+    def _units_available(self, product_id, count):
+        """
+        Lets the consumers that wait for the product know that count units of it
+        became available.
+        """
+        if self.fair:
+            self._waiter_queue(product_id).hand_off()
+        else:
+            self._notify(self._item_condition(product_id), count)
+
+    def _waiter_queue(self, product_id):
+        """
+        Returns the queue of the consumers that wait for the product.
+        """
+        queue = self.waiter_queues.get(product_id)
+        if queue is None:
+            queue = self.waiter_queues.setdefault(
+                product_id, WaiterQueue(functools.partial(self._reserve, product_id)))
+
+        return queue
+
+    def _new_condition(self, name):
+        """
+        Returns a new condition, whose lock is instrumented when the Marketplace has metrics.
+        """
+        if self.metrics is None:
+            return Condition()
+
+        return Condition(self.metrics.new_lock(name))
+
+    @staticmethod
+    def _wait_for(condition, attempt, timeout):
+        """
+        Calls attempt until it returns something else than None, waiting for condition
+        to be signaled between the calls, for at most timeout seconds.
+
+        attempt runs with the condition's lock held, so that a signal sent after a failed
+        attempt is not lost. It must not acquire other conditions.
+
+        :returns the last result of attempt
+        """
+        result = attempt()
+        if result is not None or timeout == 0:
+            return result
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with condition:
+            while True:
+                result = attempt()
+                if result is not None:
+                    return result
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+
+                condition.wait(remaining)
+
+    @staticmethod
+    def _notify(condition, count=1):
+        """
+        Wakes up count threads that wait for condition.
+        """
+        with condition:
+            condition.notify(count)
@@ -0,0 +1,298 @@
+"""
+This module represents the optional instrumentation of the Marketplace.
+
+A Marketplace created with a Metrics object times the waits for its locks, those of
+its conditions included, and how long they are held, and counts the rejected publish
+and add attempts; the producers and consumers add up the time they spend waiting to
+retry, and the consumers record how long every add operation took, to tell how fairly
+the units are shared. Without a Metrics object the locks are plain and nothing is
+counted.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+
+# the upper bounds of the lock histograms' buckets, in seconds
+LOCK_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+# the upper bounds of the consumer wait histograms' buckets, in seconds
+WAIT_BUCKETS = (1e-3, 1e-2, 1e-1, 1.0, 10.0, 60.0)
+
+
+class Histogram:
+    """
+    Class that counts the observed values that fall in every bucket.
+    """
+
+    def __init__(self, bounds=LOCK_BUCKETS):
+        """
+        Constructor
+
+        :type bounds: Tuple
+        :param bounds: the ascending upper bounds of the buckets, without the infinite one
+        """
+
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.max = 0.0
+        # serializes the observations of this histogram only, so that observing the
+        # locks does not serialize them
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        Counts value in its bucket.
+        """
+        with self.lock:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def add(self, other):
+        """
+        Counts the values observed by other, a histogram with the same bounds.
+        """
+        with other.lock:
+            counts, total, largest = list(other.counts), other.sum, other.max
+
+        with self.lock:
+            self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+            self.sum += total
+            self.max = max(self.max, largest)
+
+    def snapshot(self):
+        """
+        Returns the cumulative bucket counts, keyed by upper bound, their count, their
+        sum and the largest value.
+        """
+        with self.lock:
+            counts, total_sum, largest = list(self.counts), self.sum, self.max
+
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            total += count
+            buckets[bound] = total
+
+        return {"buckets": buckets, "count": total, "sum": total_sum, "max": largest}
+
+    @classmethod
+    def merged(cls, histograms, bounds=LOCK_BUCKETS):
+        """
+        Returns the snapshot of the values observed by all the histograms.
+        """
+        total = cls(bounds)
+        for histogram in histograms:
+            total.add(histogram)
+
+        return total.snapshot()
+
+
+class InstrumentedLock:
+    """
+    Lock that records how long its callers wait for it and how long they hold it.
+    It can be the lock of a threading.Condition.
+    """
+
+    def __init__(self, wait, hold):
+        """
+        Constructor
+
+        :type wait: Histogram
+        :param wait: the histogram of the waits
+
+        :type hold: Histogram
+        :param hold: the histogram of the holds
+        """
+
+        self.lock = threading.Lock()
+        self.wait = wait
+        self.hold = hold
+        # only the holder sets them
+        self.acquired_at = 0.0
+        self.owner = None
+
+    def acquire(self, blocking=True, timeout=-1):
+        """
+        Acquires the lock, see threading.Lock.acquire.
+        """
+        start = time.perf_counter()
+        # released by release, this is the lock's own acquire
+        acquired = self.lock.acquire(blocking, timeout)  # pylint: disable=consider-using-with
+        if acquired:
+            self.acquired_at = time.perf_counter()
+            self.owner = threading.get_ident()
+            self.wait.observe(self.acquired_at - start)
+
+        return acquired
+
+    def release(self):
+        """
+        Releases the lock.
+        """
+        held = time.perf_counter() - self.acquired_at
+        self.owner = None
+        self.lock.release()
+        self.hold.observe(held)
+
+    def _is_owned(self):
+        """
+        Tells a threading.Condition whether the current thread holds the lock; without
+        it, the condition would find out by trying to acquire the lock.
+        """
+        return self.owner == threading.get_ident()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class Metrics:
+    """
+    Class that gathers the Marketplace's lock timings, rejected attempts and retry
+    waits. Its snapshots can be taken while the market runs.
+    """
+
+    def __init__(self):
+        # guards the dictionaries, the histograms take their own locks
+        self.lock = threading.Lock()
+        # lock name -> the Histograms of the locks with the name
+        self.lock_waits = {}
+        self.lock_holds = {}
+        # operation -> {producer_id: number of rejected attempts}
+        self.rejected_by_producer = {}
+        # operation -> {product_id: number of rejected attempts}
+        self.rejected_by_product = {}
+        # role -> seconds spent waiting to retry
+        self.retry_waits = {}
+        # consumer name -> Histogram of the times its add operations took to complete
+        self.consumer_waits = {}
+
+    def new_lock(self, name):
+        """
+        Returns a new lock whose timings are reported with those of the other locks
+        with the same name. Every lock has histograms of its own, so that observing
+        a lock does not wait for the others.
+        """
+        wait = Histogram()
+        hold = Histogram()
+        with self.lock:
+            self.lock_waits.setdefault(name, []).append(wait)
+            self.lock_holds.setdefault(name, []).append(hold)
+
+        return InstrumentedLock(wait, hold)
+
+    def rejected(self, operation, product_id, producer_id=None):
+        """
+        Counts a rejected attempt of operation, 'publish' or 'add'.
+
+        :type producer_id: Int
+        :param producer_id: the producer that was rejected, if the operation has one
+        """
+        with self.lock:
+            by_product = self.rejected_by_product.setdefault(operation, {})
+            by_product[product_id] = by_product.get(product_id, 0) + 1
+            if producer_id is not None:
+                by_producer = self.rejected_by_producer.setdefault(operation, {})
+                by_producer[producer_id] = by_producer.get(producer_id, 0) + 1
+
+    def retried(self, role, seconds):
+        """
+        Adds seconds to the time that the actors with the role, 'producer' or 'consumer',
+        spent waiting to retry.
+        """
+        with self.lock:
+            self.retry_waits[role] = self.retry_waits.get(role, 0.0) + seconds
+
+    def waited(self, name, seconds):
+        """
+        Counts the seconds that the consumer with the given name took to get all the
+        units of an add operation.
+        """
+        histogram = self.consumer_waits.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.consumer_waits.setdefault(name, Histogram(WAIT_BUCKETS))
+        histogram.observe(seconds)
+
+    def snapshot(self):
+        """
+        Returns a copy of the metrics as a dictionary.
+        """
+        with self.lock:
+            locks = {name: (list(waits), list(self.lock_holds[name]))
+                     for name, waits in self.lock_waits.items()}
+            rejected = {operation: {"by_product": dict(by_product),
+                                    "by_producer": dict(self.rejected_by_producer
+                                                        .get(operation, {}))}
+                        for operation, by_product in self.rejected_by_product.items()}
+            retry_waits = dict(self.retry_waits)
+            consumer_waits = dict(self.consumer_waits)
+
+        # the histograms are read with their own locks, the market keeps running meanwhile
+        return {
+            "locks": {name: {"wait": Histogram.merged(waits), "hold": Histogram.merged(holds)}
+                      for name, (waits, holds) in locks.items()},
+            "rejected": rejected,
+            "retry_wait_seconds": retry_waits,
+            "consumer_waits": {name: histogram.snapshot()
+                               for name, histogram in consumer_waits.items()},
+        }
+
+    def prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        for kind in ('wait', 'hold'):
+            histogram_lines(lines, f'marketplace_lock_{kind}_seconds', 'lock',
+                            {name: histograms[kind]
+                             for name, histograms in snapshot['locks'].items()})
+
+        for key, label in (('by_producer', 'producer'), ('by_product', 'product')):
+            metric = f'marketplace_rejected_{key}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for operation, counts in snapshot['rejected'].items():
+                for owner, count in counts[key].items():
+                    lines.append(f'{metric}{{operation="{operation}",{label}="{owner}"}} '
+                                 f'{count}')
+
+        lines.append('# TYPE marketplace_retry_wait_seconds_total counter')
+        for role, seconds in snapshot['retry_wait_seconds'].items():
+            lines.append(f'marketplace_retry_wait_seconds_total{{role="{role}"}} {seconds!r}')
+
+        histogram_lines(lines, 'marketplace_consumer_wait_seconds', 'consumer',
+                        snapshot['consumer_waits'])
+        lines.append('# TYPE marketplace_consumer_wait_max_seconds gauge')
+        for name, histogram in snapshot['consumer_waits'].items():
+            lines.append(f'marketplace_consumer_wait_max_seconds{{consumer="{name}"}} '
+                         f'{histogram["max"]!r}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def histogram_lines(lines, metric, label, histograms):
+    """
+    Appends the Prometheus samples of histogram snapshots to lines.
+
+    :type histograms: Dict
+    :param histograms: label value -> histogram snapshot, see Histogram.snapshot
+    """
+    lines.append(f'# TYPE {metric} histogram')
+    for value, histogram in histograms.items():
+        for bound, count in histogram['buckets'].items():
+            bound = '+Inf' if bound == math.inf else repr(bound)
+            lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {count}')
+        lines.append(f'{metric}_sum{{{label}="{value}"}} {histogram["sum"]!r}')
+        lines.append(f'{metric}_count{{{label}="{value}"}} {histogram["count"]}')
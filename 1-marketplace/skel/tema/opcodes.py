@@ -0,0 +1,14 @@
+"""
+This module numbers the Marketplace's operations, as they are recorded in the traces,
+see tema.trace. It imports nothing, so that the Marketplace can refer to them without
+loading the trace recorder.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+OPERATIONS = ('register_producer', 'publish', 'publish_many', 'new_cart', 'add_to_cart',
+              'add_many', 'remove_from_cart', 'remove_many', 'place_order')
+(REGISTER_PRODUCER, PUBLISH, PUBLISH_MANY, NEW_CART, ADD_TO_CART, ADD_MANY,
+ REMOVE_FROM_CART, REMOVE_MANY, PLACE_ORDER) = range(len(OPERATIONS))
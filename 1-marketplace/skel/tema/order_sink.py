@@ -0,0 +1,79 @@
+"""
+This module represents the output of the placed orders.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import sys
+from threading import Lock, local
+
+
+class OrderSink:
+    """
+    Class that writes the lines of every order with a single call, so that the
+    lines of concurrent orders are never interleaved.
+    """
+
+    def __init__(self, stream=None):
+        """
+        Constructor
+
+        :type stream: TextIO
+        :param stream: where the orders are written, the current sys.stdout by default
+        """
+
+        self.stream = stream
+        self.lock = Lock()
+
+    def write_order(self, name, products):
+        """
+        Writes a "<name> bought <product>" line for every product.
+
+        :type name: String
+        :param name: the consumer's name
+
+        :type products: Iterable
+        :param products: the ordered products, one for every unit
+        """
+        self._write(''.join(f"{name} bought {prod}\n" for prod in products))
+
+    def flush(self):
+        """
+        Writes the orders kept by the calling thread, if any.
+        """
+
+    def _write(self, text):
+        """
+        Writes text to the stream, with a single call.
+        """
+        if not text:
+            return
+
+        with self.lock:
+            (self.stream or sys.stdout).write(text)
+
+
+class BufferedOrderSink(OrderSink):
+    """
+    Order sink that keeps the orders of every thread in a thread-local buffer,
+    written when the thread calls flush.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.buffers = local()
+
+    def write_order(self, name, products):
+        buffer = getattr(self.buffers, 'lines', None)
+        if buffer is None:
+            buffer = self.buffers.lines = []
+
+        buffer.append(''.join(f"{name} bought {prod}\n" for prod in products))
+
+    def flush(self):
+        buffer = getattr(self.buffers, 'lines', None)
+        if buffer:
+            self._write(''.join(buffer))
+            buffer.clear()
@@ -10,6 +10,26 @@ import time
 from threading import Thread
 
 
+def units_ready(remaining, ready_at, now, wait_time):
+    """
+    Returns how many of the remaining units are made by now, when the next one is
+    ready at ready_at and each one takes wait_time seconds; at least one.
+    """
+    if wait_time <= 0:
+        return remaining
+
+    return min(remaining, max(1, int((now - ready_at) / wait_time) + 1))
+
+
+def next_ready(ready_at, published, waited, wait_time):
+    """
+    Returns when the next unit is ready, once published units were published after
+    waiting waited seconds for room in the queue: no unit is made while the producer
+    waits.
+    """
+    return ready_at + published * wait_time + waited
+
+
 class Producer(Thread):
     """
     Class that represents a producer.
@@ -26,8 +46,8 @@ class Producer(Thread):
         @param marketplace: a reference to the marketplace
 
         @type republish_wait_time: Time
-        @param republish_wait_time: the number of seconds that a producer must
-        wait until the marketplace becomes available
+        @param republish_wait_time: the maximum number of seconds that a producer
+        waits for room in its queue before trying again
 
         @type kwargs:
         @param kwargs: other arguments that are passed to the Thread's __init__()
@@ -41,16 +61,44 @@ class Producer(Thread):
         Thread.__init__(self, **kwargs)
 
     def run(self):
-
         while True:
-            for i in range(len(self.products)):
-                j = 0
-                while j < self.products[i][1]:
-
-                    check = self.marketplace.publish(
-                        str(self.prod_id), self.products[i][0])
-                    if check == 1:
-                        time.sleep(self.products[i][2])
-                        j += 1
-                    else:
-                        time.sleep(self.republish_wait_time)
+            for product, quantity, wait_time in self.products:
+                self.produce(product, quantity, wait_time)
+
+    def produce(self, product, quantity, wait_time):
+        """
+        Publishes quantity units of the product, each one as soon as it is made: the
+        first one wait_time seconds after the producer starts it, and every next one
+        wait_time seconds after the previous one. The units that are ready together,
+        when the producer runs late, are published in a single call.
+
+        @type product: Product
+        @param product: the product
+
+        @type quantity: Int
+        @param quantity: the number of units to publish
+
+        @type wait_time: Time
+        @param wait_time: the number of seconds that making a unit takes
+        """
+        metrics = self.marketplace.metrics
+        # when the next unit is ready
+        ready_at = time.monotonic() + wait_time
+        j = 0
+
+        while j < quantity:
+            now = time.monotonic()
+            if now < ready_at:
+                time.sleep(ready_at - now)
+                now = time.monotonic()
+
+            # publishes the ready units at once, waiting for room instead of
+            # sleeping blindly
+            count = self.marketplace.publish_many(
+                self.prod_id, product, units_ready(quantity - j, ready_at, now, wait_time),
+                timeout=self.republish_wait_time)
+            waited = time.monotonic() - now
+            ready_at = next_ready(ready_at, count, waited, wait_time)
+            j += count
+            if not count and metrics is not None:
+                metrics.retried('producer', waited)
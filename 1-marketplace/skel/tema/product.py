@@ -9,7 +9,7 @@ March 2021
 from dataclasses import dataclass
 
 
-@dataclass(init=True, repr=True, order=False, frozen=True)
+@dataclass(init=True, repr=True, order=False, frozen=True, slots=True)
 class Product:
     """
     Class that represents a product.
@@ -18,7 +18,7 @@ class Product:
     price: int
 
 
-@dataclass(init=True, repr=True, order=False, frozen=True)
+@dataclass(init=True, repr=True, order=False, frozen=True, slots=True)
 class Tea(Product):
     """
     Tea products
@@ -26,10 +26,14 @@ class Tea(Product):
     type: str
 
 
-@dataclass(init=True, repr=True, order=False, frozen=True)
+@dataclass(init=True, repr=True, order=False, frozen=True, slots=True)
 class Coffee(Product):
     """
     Coffee products
     """
     acidity: str
     roast_level: str
+
+
+# the name of every product class -> the class, as the "product_type" of the configurations
+PRODUCT_TYPES = {cls.__name__: cls for cls in (Product, Tea, Coffee)}
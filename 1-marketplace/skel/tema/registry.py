@@ -0,0 +1,64 @@
+"""
+This module represents the registries of carts and producers.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+from itertools import count
+
+DEFAULT_SHARDS = 16
+
+
+class Registry:
+    """
+    Class that hands out ids and keeps the object registered under every id.
+
+    The ids come from an itertools.count, whose next() is atomic in CPython, so
+    no lock is needed to allocate them. The objects are spread over several
+    dictionaries by id, so that registering and retiring objects do not all
+    resize the same dictionary.
+    """
+
+    def __init__(self, start=0, shards=DEFAULT_SHARDS):
+        """
+        Constructor
+
+        :type start: Int
+        :param start: the first id
+
+        :type shards: Int
+        :param shards: the number of dictionaries that hold the objects
+        """
+
+        self.ids = count(start)
+        self.shards = [{} for _ in range(shards)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __getitem__(self, item_id):
+        return self.shards[item_id % len(self.shards)][item_id]
+
+    def add(self, item):
+        """
+        Registers item under a new id.
+
+        :returns the id
+        """
+        item_id = next(self.ids)
+        self.shards[item_id % len(self.shards)][item_id] = item
+        return item_id
+
+    def get(self, item_id, default=None):
+        """
+        Returns the object registered under item_id, or default.
+        """
+        return self.shards[item_id % len(self.shards)].get(item_id, default)
+
+    def pop(self, item_id, default=None):
+        """
+        Retires item_id and returns its object, or default if it is not registered.
+        """
+        return self.shards[item_id % len(self.shards)].pop(item_id, default)
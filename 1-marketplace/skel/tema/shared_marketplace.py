@@ -0,0 +1,302 @@
+"""
+This module represents the multiprocess Marketplace.
+
+The inventory counts live in shared memory. Every worker process runs a share of
+the producers and consumers as threads, against its own SharedMarketplace over
+the shared inventory, and sends the placed orders to the parent through a pipe.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import multiprocessing
+import sys
+from contextlib import nullcontext
+from multiprocessing.connection import wait
+from types import SimpleNamespace
+
+from tema.consumer import Consumer
+from tema.marketlog import configure_logging
+from tema.base_marketplace import logger
+from tema.marketplace import Marketplace
+from tema.order_sink import OrderSink
+from tema.producer import Producer
+
+
+class SharedInventory:
+    """
+    Class that keeps the inventory counts in shared memory arrays, guarded by a lock
+    shared by all the processes. It offers the same operations as Inventory, and the
+    conditions that the marketplaces of the processes wait on and signal.
+
+    The arrays have a fixed size, so the number of products and producers must be
+    known when the inventory is created.
+    """
+
+    def __init__(self, queue_size_per_producer, products, producers, context=multiprocessing):
+        """
+        Constructor
+
+        :type queue_size_per_producer: Int
+        :param queue_size_per_producer: the maximum size of a queue associated with each producer
+
+        :type products: Int
+        :param products: the number of products in the catalog
+
+        :type producers: Int
+        :param producers: the number of producers
+
+        :type context: multiprocessing context
+        :param context: the context of the processes that share the inventory
+        """
+
+        self.queue_size_per_producer = queue_size_per_producer
+        self.producers = producers
+        self.lock = context.Lock()
+        self.next_producer = context.RawValue('q', 0)
+        # producer_id -> number of units the producer currently has in the marketplace
+        self.producer_queue = context.RawArray('q', producers)
+        # product_id * producers + producer_id -> number of available units
+        self.stock = context.RawArray('q', products * producers)
+        # product_id -> number of available units, from all the producers
+        self.totals = context.RawArray('q', products)
+        # product_id -> condition signaled when a unit of the product becomes available
+        self.item_available = [context.Condition() for _ in range(products)]
+        # producer_id -> condition signaled when a unit leaves the producer's queue
+        self.space_available = [context.Condition() for _ in range(producers)]
+
+    def new_producer(self):
+        """
+        Returns an id for a new producer, unique across the processes.
+        """
+        with self.lock:
+            producer_id = self.next_producer.value
+            if producer_id >= self.producers:
+                raise ValueError(f"the inventory has room for {self.producers} producers")
+
+            self.next_producer.value += 1
+
+        return producer_id
+
+    def add_producer(self, producer_id):
+        """
+        The producers' queues are allocated when the inventory is created.
+        """
+
+    def put(self, producer_id, product_id):
+        """
+        Adds a unit of the product on behalf of the producer, see Inventory.put.
+        """
+        return self.put_many(producer_id, product_id, 1) == 1
+
+    def put_many(self, producer_id, product_id, quantity):
+        """
+        Adds up to quantity units of the product on behalf of the producer, see
+        Inventory.put_many.
+        """
+        with self.lock:
+            count = min(quantity,
+                        self.queue_size_per_producer - self.producer_queue[producer_id])
+            if count <= 0:
+                return 0
+
+            self.producer_queue[producer_id] += count
+            self.stock[product_id * self.producers + producer_id] += count
+            self.totals[product_id] += count
+
+        return count
+
+    def reserve_many(self, product_id, quantity, partial=True):
+        """
+        Takes up to quantity units of the product, see Inventory.reserve_many.
+        The producers with lower ids are served first.
+        """
+        taken = {}
+        with self.lock:
+            available = self.totals[product_id]
+            if available == 0 or (not partial and available < quantity):
+                return taken
+
+            quantity = min(quantity, available)
+            self.totals[product_id] -= quantity
+
+            base = product_id * self.producers
+            producer_id = 0
+            while quantity:
+                count = min(quantity, self.stock[base + producer_id])
+                if count:
+                    self.stock[base + producer_id] -= count
+                    self.producer_queue[producer_id] -= count
+                    taken[producer_id] = count
+                    quantity -= count
+
+                producer_id += 1
+
+        return taken
+
+    def release(self, producer_id, product_id, count=1):
+        """
+        Puts back units of the product, see Inventory.release.
+        """
+        with self.lock:
+            self.producer_queue[producer_id] += count
+            self.stock[product_id * self.producers + producer_id] += count
+            self.totals[product_id] += count
+
+    def available(self, product_id):
+        """
+        Returns the number of units of the product that can be reserved.
+        """
+        return self.totals[product_id]
+
+    def snapshot(self):
+        """
+        Returns product_id -> number of available units, see Inventory.snapshot.
+        """
+        return {product_id: count for product_id, count in enumerate(self.totals[:]) if count}
+
+
+class SharedMarketplace(Marketplace):
+    """
+    Marketplace of a worker process, over an inventory shared with the other workers.
+
+    The carts are local to the process. The conditions are shared by the processes,
+    so a unit published or some room made by another process wakes up the threads
+    that wait for it here.
+    """
+
+    def __init__(self, inventory, order_sink=None, catalog=None):
+        """
+        Constructor
+
+        :type inventory: SharedInventory
+        :param inventory: the inventory shared by the processes
+
+        :type order_sink: OrderSink
+        :param order_sink: where the placed orders are written
+
+        :type catalog: ProductCatalog
+        :param catalog: the catalog that the inventory was sized for
+        """
+
+        super().__init__(inventory.queue_size_per_producer, order_sink=order_sink,
+                         catalog=catalog)
+
+        # the shared inventory takes its own lock
+        self.inventory = inventory
+        self.modify_cart = nullcontext()
+        self.space_available = inventory.space_available
+        self.item_available = dict(enumerate(inventory.item_available))
+
+    def register_producer(self):
+        """
+        Returns an id for the producer that calls this, unique across the processes.
+        """
+        logger.info('register_producer')
+
+        return self.inventory.new_producer()
+
+
+def pipe_order_sink(connection):
+    """
+    Returns an order sink that sends the orders to the parent process, every order
+    with a single message.
+
+    :type connection: Connection
+    :param connection: the worker's end of the pipe to the parent
+    """
+    return OrderSink(SimpleNamespace(write=connection.send))
+
+
+def run_worker(connection, inventory, catalog, producers, consumers, *, log_mode, log_sample,
+               log_file):
+    """
+    Runs a share of the producers and consumers in a worker process. When its consumers
+    are done, the worker tells the parent and keeps its producers running until the
+    parent says that all the consumers are done.
+    """
+    shutdown_logging = configure_logging(log_mode, log_file, sample_every=log_sample)
+    marketplace = SharedMarketplace(inventory, order_sink=pipe_order_sink(connection),
+                                    catalog=catalog)
+
+    producer_threads = [Producer(**p_config, marketplace=marketplace, daemon=True)
+                        for p_config in producers]
+    for producer in producer_threads:
+        producer.start()
+
+    consumer_threads = [Consumer(**c_config, marketplace=marketplace)
+                        for c_config in consumers]
+    for consumer in consumer_threads:
+        consumer.start()
+    for consumer in consumer_threads:
+        consumer.join()
+
+    connection.send(None)
+    connection.recv()
+    shutdown_logging()
+
+
+def run_processes(market_config, catalog, processes, *, log_mode='queue', log_sample=1,
+                  stream=None, log_file='marketplace.log'):
+    """
+    Runs the producers and consumers of market_config in worker processes, spread
+    round-robin, and writes the placed orders to stream.
+
+    :type market_config: Dict
+    :param market_config: the configuration, with the product ids replaced by products
+
+    :type catalog: ProductCatalog
+    :param catalog: the catalog with all the products of the configuration
+
+    :type processes: Int
+    :param processes: the number of worker processes
+
+    :type stream: TextIO
+    :param stream: where the orders are written, the current sys.stdout by default
+
+    :type log_file: String
+    :param log_file: the file the workers log the Marketplace calls to
+    """
+    stream = stream or sys.stdout
+    context = multiprocessing.get_context('spawn')
+    inventory = SharedInventory(market_config['marketplace']['queue_size_per_producer'],
+                                len(catalog), len(market_config['producers']), context)
+
+    connections = []
+    workers = []
+    for i in range(processes):
+        parent_end, worker_end = context.Pipe()
+        worker = context.Process(target=run_worker, args=(
+            worker_end, inventory, catalog,
+            market_config['producers'][i::processes], market_config['consumers'][i::processes]),
+            kwargs={'log_mode': log_mode, 'log_sample': log_sample, 'log_file': log_file})
+        worker.start()
+        worker_end.close()
+        connections.append(parent_end)
+        workers.append(worker)
+
+    try:
+        running = set(connections)
+        while running:
+            for connection in wait(running):
+                try:
+                    text = connection.recv()
+                except EOFError:
+                    raise RuntimeError("a marketplace worker died") from None
+
+                if text is None:
+                    running.remove(connection)
+                else:
+                    stream.write(text)
+
+        for connection in connections:
+            connection.send(None)
+        for worker in workers:
+            worker.join()
+    finally:
+        # when a worker dies, the others wait for the parent forever
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
@@ -0,0 +1,112 @@
+"""
+This module represents the discrete-event simulation of the asyncio Marketplace.
+
+The simulation runs the asyncio producers and consumers on an event loop whose
+clock is virtual: when every task waits, the clock jumps to the earliest timer
+in the loop's heap instead of sleeping until it expires. Running the callbacks
+that are ready costs a TICK of virtual time, so the timers expire even while a
+task retries without waiting. Such a task still moves the clock a TICK at a time,
+so the configurations whose actors retry without waiting are rejected, see
+check_config.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import asyncio
+import selectors
+
+# the least virtual time between scheduling a timer and its expiry, so that a
+# timeout that rounds down to the current time still moves the clock forward; it
+# is also the virtual time that an iteration of the loop with ready callbacks takes
+TICK = 1e-6
+
+
+class VirtualClockSelector(selectors.SelectSelector):
+    """
+    Selector that never blocks: a select that would wait advances the virtual clock
+    by the time it would have waited, and a select that would not wait advances it
+    by a TICK.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.now = 0.0
+
+    def select(self, timeout=None):
+        """
+        Returns the ready events without waiting, see selectors.BaseSelector.select.
+        """
+        ready = super().select(0)
+        if ready:
+            return ready
+
+        if timeout == 0:
+            # the loop has callbacks to run; if they did not take any time, a task
+            # that retries without waiting would keep the timers from ever expiring
+            self.now += TICK
+            return ready
+
+        if timeout is None:
+            # no task can run again, nor does any timer remain to wake one up
+            raise RuntimeError("the simulation is deadlocked")
+
+        self.now += timeout
+        return ready
+
+
+class SimulationEventLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop that runs the scheduled callbacks in the order of their virtual times.
+
+    The time spent running the callbacks is not measured: every iteration of the loop
+    that has callbacks ready takes a TICK, however long they run.
+    """
+
+    def __init__(self):
+        super().__init__(VirtualClockSelector())
+
+    def time(self):
+        """
+        Returns the virtual time, in seconds since the loop started.
+        """
+        return self._selector.now
+
+    def call_at(self, when, callback, *args, context=None):
+        """
+        Schedules callback at the virtual time when, at least a TICK from now, see
+        asyncio.loop.call_at.
+        """
+        return super().call_at(max(when, self.time() + TICK), callback, *args,
+                               context=context)
+
+
+def check_config(market_config):
+    """
+    Checks that every producer and consumer of the market configuration waits before
+    it tries again. A task that retries without waiting moves the virtual clock only a
+    TICK at a time, the simulation would take a million iterations per virtual second.
+
+    :type market_config: Dict
+    :param market_config: the market configuration, see test.collect_config
+    """
+    waits = [(producer['name'], producer['republish_wait_time'])
+             for producer in market_config['producers']]
+    waits += [(consumer['name'], consumer['retry_wait_time'])
+              for consumer in market_config['consumers']]
+
+    for name, wait in waits:
+        if wait <= 0:
+            raise ValueError(f"{name} retries without waiting, which the simulation "
+                             "does not support")
+
+
+def run_simulation(main):
+    """
+    Runs the coroutine main on a SimulationEventLoop, the way asyncio.run runs it.
+
+    :returns the result of main
+    """
+    with asyncio.Runner(loop_factory=SimulationEventLoop) as runner:
+        return runner.run(main)
@@ -0,0 +1,103 @@
+"""
+This module tests the asyncio Marketplace.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import asyncio
+import unittest
+
+from tema.async_marketplace import AsyncMarketplace
+from tema.product import Tea
+
+
+class TestAsyncMarketplace(unittest.IsolatedAsyncioTestCase):
+    """Test asyncio marketplace."""
+
+    def setUp(self):
+        self.obj = AsyncMarketplace(3)
+        self.tea_1 = Tea('Wild Cherry', 5, 'Black')
+        self.tea_2 = Tea('Cactus fig', 3, 'Green')
+
+    async def test_publish(self):
+        """Publish product test."""
+        self.assertEqual(self.obj.register_producer(), 0)
+        for _ in range(3):
+            self.assertEqual(await self.obj.publish(0, self.tea_1), True)
+        self.assertEqual(await self.obj.publish(0, self.tea_1), False)
+
+    async def test_add_remove(self):
+        """Add to and remove from cart test."""
+        self.obj.register_producer()
+        await self.obj.publish(0, self.tea_1)
+        cart_id = self.obj.new_cart()
+        self.assertEqual(await self.obj.add_to_cart(cart_id, self.tea_1), True)
+        self.assertEqual(await self.obj.add_to_cart(cart_id, self.tea_2), False)
+        self.assertEqual(await self.obj.remove_from_cart(cart_id, self.tea_1), True)
+        self.assertEqual(await self.obj.remove_from_cart(cart_id, self.tea_1), False)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 1})
+
+    async def test_add_quantity(self):
+        """Adding and removing several units at once."""
+        self.obj.register_producer()
+        await self.obj.publish(0, self.tea_1)
+        await self.obj.publish(0, self.tea_1)
+        cart_id = self.obj.new_cart()
+        self.assertEqual(await self.obj.add_to_cart(cart_id, self.tea_1, quantity=3), False)
+        self.assertEqual(await self.obj.add_many(cart_id, self.tea_1, 3), 2)
+        self.assertEqual(await self.obj.remove_from_cart(cart_id, self.tea_1, quantity=3), False)
+        self.assertEqual(await self.obj.remove_many(cart_id, self.tea_1, 3), 2)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 2})
+
+    async def test_publish_many(self):
+        """publish_many adds as many units as fit in the queue."""
+        self.obj.register_producer()
+        self.assertEqual(await self.obj.publish_many(0, self.tea_1, 2), 2)
+        self.assertEqual(await self.obj.publish_many(0, self.tea_2, 5), 1)
+        self.assertEqual(await self.obj.publish_many(0, self.tea_2, 5), 0)
+        self.assertEqual(await self.obj.add_many(self.obj.new_cart(), self.tea_1, 2), 2)
+        self.assertEqual(await self.obj.publish_many(0, self.tea_2, 5), 2)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 3})
+
+    async def test_read_api(self):
+        """The stock and the carts can be read without changing them."""
+        self.obj.register_producer()
+        await self.obj.publish_many(0, self.tea_1, 3)
+        cart_id = self.obj.new_cart()
+        await self.obj.add_many(cart_id, self.tea_1, 2)
+
+        self.assertEqual(self.obj.available(self.tea_1), 1)
+        self.assertEqual(self.obj.available(self.tea_2), 0)
+        self.assertEqual(self.obj.inventory_snapshot(), {self.tea_1: 1})
+        self.assertEqual(self.obj.cart_contents(cart_id), {self.tea_1: 2})
+        self.assertEqual(self.obj.cart_contents(cart_id + 1), None)
+
+    async def test_blocking_add_to_cart(self):
+        """add_to_cart with a timeout waits for the product to be published."""
+        self.obj.register_producer()
+        cart_id = self.obj.new_cart()
+        self.assertEqual(await self.obj.add_to_cart(cart_id, self.tea_1, timeout=0.01), False)
+
+        waiter = asyncio.create_task(self.obj.add_to_cart(cart_id, self.tea_1, timeout=None))
+        await asyncio.sleep(0.01)
+        self.assertEqual(await self.obj.publish(0, self.tea_1), True)
+        self.assertEqual(await waiter, True)
+
+    async def test_blocking_publish(self):
+        """publish with a timeout waits for room in the producer's queue."""
+        self.obj.register_producer()
+        for _ in range(3):
+            await self.obj.publish(0, self.tea_1)
+
+        waiter = asyncio.create_task(self.obj.publish(0, self.tea_2, timeout=5))
+        await asyncio.sleep(0.01)
+        self.assertEqual(await self.obj.add_to_cart(self.obj.new_cart(), self.tea_1), True)
+        self.assertEqual(await waiter, True)
+        self.assertEqual(self.obj.inventory.available(self.obj.catalog.intern(self.tea_2)), 1)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
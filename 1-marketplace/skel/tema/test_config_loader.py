@@ -0,0 +1,95 @@
+"""
+This module tests the incremental configuration loader.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import io
+import json
+import unittest
+
+from tema.config_loader import CHUNK_SIZE, iter_config
+
+
+class CountingStream(io.StringIO):
+    """Text stream that counts the calls to read."""
+
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+class TestConfigLoader(unittest.TestCase):
+    """Test the incremental configuration loader."""
+
+    config = {
+        "products": {"id1": {"product_type": "Tea", "name": "Linden", "type": "Herbal",
+                             "price": 9}},
+        "producers": [{"name": "prod1", "products": [["id1", 2, 0.18]],
+                       "republish_wait_time": 0.15}],
+        "consumers": [{"name": f"cons{i}", "retry_wait_time": 0.31,
+                       "carts": [[{"type": "add", "product": "id1", "quantity": 12345}]]}
+                      for i in range(3)],
+        "marketplace": {"queue_size_per_producer": 15},
+    }
+
+    def sections(self, text, chunk_size):
+        """Returns the sections read from text."""
+        return list(iter_config(io.StringIO(text), chunk_size))
+
+    def test_sections(self):
+        """Every producer and consumer is a section, in the order of the file."""
+        for indent in (None, 4):
+            for chunk_size in (1, 7, CHUNK_SIZE):
+                sections = self.sections(json.dumps(self.config, indent=indent), chunk_size)
+                self.assertEqual(sections,
+                                 [("products", self.config["products"]),
+                                  ("producer", self.config["producers"][0])] +
+                                 [("consumer", consumer) for consumer in self.config["consumers"]] +
+                                 [("marketplace", self.config["marketplace"])])
+
+    def test_empty(self):
+        """Empty objects and arrays."""
+        self.assertEqual(self.sections('{}', 1), [])
+        self.assertEqual(self.sections('{"producers": [ ], "marketplace": {}}', 1),
+                         [("marketplace", {})])
+
+    def test_number_across_chunks(self):
+        """A number split between two chunks is read whole."""
+        self.assertEqual(self.sections('{"marketplace": 12345}', 18), [("marketplace", 12345)])
+
+    def test_invalid(self):
+        """Truncated or malformed configurations are errors."""
+        self.assertRaises(ValueError, self.sections, '{"producers": [{}', 4)
+        self.assertRaises(ValueError, self.sections, '{"producers": [{}} ', 4)
+        self.assertRaises(ValueError, self.sections, '{"marketplace": {}} {}', 4)
+
+    def test_large_value(self):
+        """A large value is read in a number of chunks that grows logarithmically."""
+        products = {f"id{i}": self.config["products"]["id1"] for i in range(20000)}
+        stream = CountingStream(json.dumps({"products": products}))
+        self.assertEqual(list(iter_config(stream, 1024)), [("products", products)])
+        self.assertLess(stream.reads, 20)
+
+    def test_sections_before_the_end(self):
+        """The actors are yielded before the rest of the file is read."""
+        config = {key: self.config[key] for key in ("products", "marketplace", "producers")}
+        config["consumers"] = [self.config["consumers"][0]] * 1000
+        text = json.dumps(config)
+        stream = io.StringIO(text)
+
+        positions = {}
+        for section, _ in iter_config(stream, 256):
+            positions.setdefault(section, stream.tell())
+        self.assertEqual(list(positions), ["products", "marketplace", "producer", "consumer"])
+        self.assertLess(positions["consumer"], len(text) // 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,586 @@
+"""
+This module tests the Marketplace.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tema import opcodes as ops
+from tema import trace as tr
+from tema.cart import HoldExpired
+from tema.catalog import ProductCatalog
+from tema.consumer import Consumer
+from tema.marketlog import configure_logging
+from tema.marketplace import Marketplace
+from tema.metrics import Metrics
+from tema.order_sink import BufferedOrderSink, OrderSink
+from tema.producer import Producer
+from tema.product import Product, Tea
+
+
+class MarketplaceTestCase(unittest.TestCase):
+    """Creates a Marketplace and the products that the tests use."""
+
+    def setUp(self):
+        self.obj = Marketplace(3)
+
+        self.pro_1 = Product('Wild Cherry', '5')
+        self.tea_1 = Tea(self.pro_1, 'Black', '5')
+        self.pro_2 = Product('Cactus fig', '3')
+        self.tea_2 = Tea(self.pro_2, 'Green', '3')
+        self.list = []
+        self.list.append(self.tea_1)
+        self.list.append(self.tea_2)
+
+    def check_producer_queue(self):
+        """Checks that a producer cannot publish more units than its queue holds."""
+        self.obj.register_producer()
+        self.obj.register_producer()
+        for _ in range(3):
+            self.assertEqual(self.obj.publish(0, self.tea_1), True)
+        self.assertEqual(self.obj.publish(0, self.tea_1), False)
+        self.assertEqual(self.obj.publish(1, self.tea_1), True)
+
+        cart_id = self.obj.new_cart()
+        self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_1), True)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 2, 1: 1})
+        self.assertEqual(self.obj.publish(0, self.tea_2), True)
+        self.assertEqual(self.obj.inventory.available(self.obj.catalog.intern(self.tea_1)), 3)
+
+
+class TestMarketplace(MarketplaceTestCase):
+    """Test marketplace."""
+
+    def test_register_producer(self):
+        """Register producer test."""
+        self.assertEqual(self.obj.register_producer(), 0)
+        self.assertEqual(self.obj.register_producer(), 1)
+        self.assertEqual(self.obj.register_producer(), 2)
+
+    def test_publish(self):
+        """Publish product test."""
+        self.obj.register_producer()
+        self.assertEqual(self.obj.publish(0, self.pro_1), True)
+
+    def test_new_cart(self):
+        """Create new cart test."""
+        self.assertEqual(self.obj.new_cart(), 1)
+        self.assertEqual(self.obj.new_cart(), 2)
+
+    def test_add_to_cart(self):
+        """Add to cart test."""
+        self.obj.register_producer()
+        self.obj.publish(0, self.pro_1)
+        self.assertEqual(self.obj.new_cart(), 1)
+        self.assertEqual(self.obj.new_cart(), 2)
+        self.assertEqual(self.obj.add_to_cart(1, self.pro_1), True)
+        self.assertEqual(self.obj.add_to_cart(1, self.pro_2), False)
+
+    def test_remove_from_cart(self):
+        """Remove from cart test."""
+        self.obj.register_producer()
+        self.obj.publish(0, self.pro_1)
+        self.assertEqual(self.obj.new_cart(), 1)
+        self.assertEqual(self.obj.new_cart(), 2)
+        self.assertEqual(self.obj.add_to_cart(1, self.pro_1), True)
+        self.assertEqual(self.obj.remove_from_cart(1, self.pro_1), True)
+        self.assertEqual(self.obj.remove_from_cart(5, self.pro_1), False)
+
+    def test_place_order(self):
+        """Place order test."""
+        self.obj.register_producer()
+        self.obj.publish(0, self.pro_1)
+        self.assertEqual(self.obj.new_cart(), 1)
+        self.assertEqual(self.obj.add_to_cart(1, self.pro_1), True)
+        self.assertEqual(self.obj.place_order(1), None)
+
+    def test_producer_queue(self):
+        """Producer queue capacity test."""
+        self.check_producer_queue()
+
+    def test_blocking_add_to_cart(self):
+        """add_to_cart with a timeout waits for the product to be published."""
+        self.obj.register_producer()
+        cart_id = self.obj.new_cart()
+
+        start = time.monotonic()
+        self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_1, timeout=0.05), False)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+        publisher = threading.Timer(0.05, self.obj.publish, args=(0, self.tea_1))
+        publisher.start()
+        self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_1, timeout=None), True)
+        publisher.join()
+
+    def test_blocking_publish(self):
+        """publish with a timeout waits for room in the producer's queue."""
+        self.obj.register_producer()
+        for _ in range(3):
+            self.obj.publish(0, self.tea_1)
+        self.assertEqual(self.obj.publish(0, self.tea_1, timeout=0.05), False)
+
+        cart_id = self.obj.new_cart()
+        consumer = threading.Timer(0.05, self.obj.add_to_cart, args=(cart_id, self.tea_1))
+        consumer.start()
+        self.assertEqual(self.obj.publish(0, self.tea_2, timeout=5), True)
+        consumer.join()
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 3})
+
+    def test_cart_counts(self):
+        """The cart keeps a count per product and producer, not the units."""
+        self.obj = Marketplace(10)
+        self.obj.register_producer()
+        self.obj.register_producer()
+        for _ in range(10):
+            self.obj.publish(0, self.tea_1)
+        self.obj.publish(1, self.tea_1)
+        cart_id = self.obj.new_cart()
+
+        self.assertEqual(self.obj.add_many(cart_id, self.tea_1, 11), 11)
+        cart = self.obj.cart_dic[cart_id]
+        self.assertEqual(cart.products, {0: {0: 10, 1: 1}})
+        self.assertEqual(len(cart), 11)
+        self.assertEqual(self.obj.remove_many(cart_id, self.tea_1, 10), 10)
+        self.assertEqual(cart.products, {0: {1: 1}})
+        self.assertEqual(list(cart), [0])
+
+    def test_product_catalog(self):
+        """The products are interned to integer ids, equal products share the id."""
+        catalog = ProductCatalog([self.tea_1])
+        self.obj = Marketplace(3, catalog=catalog)
+        self.obj.register_producer()
+        self.obj.publish(0, Tea(self.pro_1, 'Black', '5'))
+        self.obj.publish(0, self.tea_2)
+
+        self.assertEqual(len(catalog), 2)
+        self.assertEqual(catalog.intern(self.tea_1), 0)
+        self.assertEqual(catalog.intern(Tea(self.pro_2, 'Green', '3')), 1)
+        self.assertIs(catalog.canonical(Tea(self.pro_1, 'Black', '5')), self.tea_1)
+        self.assertEqual(self.obj.inventory.available(0), 1)
+        self.assertEqual(self.obj.add_to_cart(self.obj.new_cart(), self.tea_1), True)
+
+        # an equal product that was not interned yet is found without the lock
+        with mock.patch.object(catalog, 'lock') as lock:
+            self.assertEqual(catalog.intern(Tea(self.pro_2, 'Green', '3')), 1)
+        lock.__enter__.assert_not_called()
+
+    def test_concurrent_registration(self):
+        """Carts and producers created by many threads get distinct ids."""
+        ids = []
+
+        def register():
+            for _ in range(100):
+                ids.append(self.obj.new_cart())
+            self.obj.register_producer()
+
+        threads = [threading.Thread(target=register) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(ids), list(range(1, 801)))
+        self.assertEqual(len(self.obj.cart_dic), 800)
+        self.assertEqual(sorted(self.obj.inventory.producer_queue), list(range(8)))
+        self.obj.place_order(ids[0])
+        self.assertEqual(self.obj.cart_dic.get(ids[0]), None)
+
+    def test_remove_returns_to_owner(self):
+        """Removed products go back to the producer that published them."""
+        self.obj.register_producer()
+        self.obj.register_producer()
+        self.obj.publish(1, self.tea_2)
+        cart_id = self.obj.new_cart()
+        self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_2), True)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 0, 1: 0})
+        self.assertEqual(self.obj.remove_from_cart(cart_id, self.tea_2), True)
+        self.assertEqual(self.obj.remove_from_cart(cart_id, self.tea_2), False)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 0, 1: 1})
+
+    def test_read_api(self):
+        """The stock and the carts can be read without changing them, in both locking modes."""
+        for locking in ('global', 'striped'):
+            market = Marketplace(3, locking=locking)
+            market.register_producer()
+            market.register_producer()
+            market.publish_many(0, self.tea_1, 3)
+            market.publish(1, self.tea_2)
+            cart_id = market.new_cart()
+            self.assertEqual(market.add_many(cart_id, self.tea_1, 2), 2)
+            self.assertEqual(market.add_to_cart(cart_id, self.tea_2), True)
+
+            self.assertEqual(market.available(self.tea_1), 1)
+            self.assertEqual(market.available(self.tea_2), 0)
+            # an unknown product is not interned by a read
+            self.assertEqual(market.available(Tea('Linden', 2, 'Herbal')), 0)
+            self.assertEqual(len(market.catalog), 2)
+            self.assertEqual(market.inventory_snapshot(), {self.tea_1: 1})
+            self.assertEqual(market.cart_contents(cart_id), {self.tea_1: 2, self.tea_2: 1})
+            self.assertEqual(market.cart_contents(cart_id + 1), None)
+
+            self.assertEqual(market.remove_many(cart_id, self.tea_1, 2), 2)
+            self.assertEqual(market.inventory_snapshot(), {self.tea_1: 3})
+            self.assertEqual(market.cart_contents(cart_id), {self.tea_2: 1})
+
+    def test_producer_timing(self):
+        """A producer publishes every unit once it is made, not the whole quantity at once."""
+        market = Marketplace(10)
+        producer = Producer([(self.tea_1, 3, 0.2)], market, 0.01, daemon=True)
+        producer.start()
+
+        time.sleep(0.1)
+        self.assertEqual(market.inventory.available(0), 0)
+        time.sleep(0.2)
+        self.assertEqual(market.inventory.available(0), 1)
+        time.sleep(0.2)
+        self.assertEqual(market.inventory.available(0), 2)
+
+
+class TestLocking(MarketplaceTestCase):
+    """Test the locking modes of the Marketplace."""
+
+    def test_striped_locking(self):
+        """Striped locking behaves like the global lock."""
+        self.obj = Marketplace(3, locking='striped', stripes=4)
+        self.check_producer_queue()
+
+        with self.assertRaises(ValueError):
+            Marketplace(3, locking='none')
+
+    def test_striped_locking_threads(self):
+        """Concurrent consumers take every published unit exactly once."""
+        self.obj = Marketplace(1000, locking='striped', stripes=4)
+        prod_id = self.obj.register_producer()
+        for _ in range(500):
+            self.obj.publish(prod_id, self.tea_1)
+            self.obj.publish(prod_id, self.tea_2)
+
+        carts = [self.obj.new_cart() for _ in range(8)]
+
+        def consume(cart_id, product):
+            while self.obj.add_to_cart(cart_id, product):
+                pass
+
+        threads = [threading.Thread(target=consume, args=(cart_id, self.list[i % 2]))
+                   for i, cart_id in enumerate(carts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(len(self.obj.cart_dic[cart_id]) for cart_id in carts), 1000)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 0})
+
+    def test_doomed_add_skips_lock(self):
+        """An add that cannot succeed does not take the inventory lock."""
+        self.obj.register_producer()
+        self.obj.publish(0, self.tea_1)
+        cart_id = self.obj.new_cart()
+
+        with mock.patch.object(self.obj, 'modify_cart', wraps=self.obj.modify_cart) as lock:
+            self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_1, quantity=2), False)
+            self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_2), False)
+            lock.__enter__.assert_not_called()
+            self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_1), True)
+            lock.__enter__.assert_called_once()
+
+
+class TestOrderOutput(MarketplaceTestCase):
+    """Test the logging and the output of the placed orders."""
+
+    def test_queue_logging(self):
+        """The calls are logged by the background thread, sampled and counted."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'marketplace.log')
+            shutdown = configure_logging('queue', filename, sample_every=2)
+            try:
+                for _ in range(3):
+                    self.obj.new_cart()
+                self.obj.register_producer()
+            finally:
+                shutdown()
+
+            with open(filename, encoding='utf-8') as log_file:
+                self.assertEqual(log_file.read().splitlines(),
+                                 ['new_cart', 'new_cart', 'register_producer',
+                                  'new_cart: 3 calls', 'register_producer: 1 calls'])
+
+    def test_order_sink(self):
+        """Every order is written with a single call."""
+        stream = io.StringIO()
+        self.obj = Marketplace(3, order_sink=OrderSink(stream))
+        self.obj.register_producer()
+        self.obj.publish(0, self.tea_1)
+        self.obj.publish(0, self.tea_1)
+        cart_id = self.obj.new_cart()
+        self.obj.add_to_cart(cart_id, self.tea_1)
+        self.obj.add_to_cart(cart_id, self.tea_1)
+
+        with mock.patch.object(stream, 'write', wraps=stream.write) as write:
+            self.obj.place_order(cart_id)
+        write.assert_called_once()
+        name = threading.current_thread().name
+        self.assertEqual(stream.getvalue(), f"{name} bought {self.tea_1}\n" * 2)
+
+    def test_buffered_order_sink(self):
+        """The buffered orders are written when the thread flushes them."""
+        stream = io.StringIO()
+        self.obj = Marketplace(3, order_sink=BufferedOrderSink(stream))
+        self.obj.register_producer()
+        for product in self.list:
+            self.obj.publish(0, product)
+            cart_id = self.obj.new_cart()
+            self.obj.add_to_cart(cart_id, product)
+            self.obj.place_order(cart_id)
+
+        self.assertEqual(stream.getvalue(), "")
+        self.obj.flush_orders()
+        self.assertEqual(stream.getvalue().splitlines(),
+                         [f"{threading.current_thread().name} bought {product}"
+                          for product in self.list])
+
+
+class TestBulkOperations(MarketplaceTestCase):
+    """Test the operations on several units at once."""
+
+    def test_add_quantity(self):
+        """Adding several units at once, all or none and partially."""
+        self.obj.register_producer()
+        self.obj.register_producer()
+        self.obj.publish(0, self.tea_1)
+        self.obj.publish(1, self.tea_1)
+        cart_id = self.obj.new_cart()
+
+        self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_1, quantity=3), False)
+        self.assertEqual(self.obj.inventory.available(self.obj.catalog.intern(self.tea_1)), 2)
+        self.assertEqual(self.obj.add_many(cart_id, self.tea_1, 3), 2)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 0, 1: 0})
+        self.assertEqual(self.obj.add_many(cart_id, self.tea_1, 3), 0)
+
+        self.assertEqual(self.obj.remove_from_cart(cart_id, self.tea_1, quantity=3), False)
+        self.assertEqual(self.obj.remove_many(cart_id, self.tea_1, 3), 2)
+        self.assertEqual(self.obj.inventory.producer_queue, {0: 1, 1: 1})
+        self.assertEqual(self.obj.add_to_cart(cart_id, self.tea_1, quantity=2), True)
+        self.assertEqual(self.obj.remove_from_cart(cart_id, self.tea_1, quantity=2), True)
+
+    def test_publish_many(self):
+        """publish_many adds as many units as fit in the queue, in both locking modes."""
+        for locking in ('global', 'striped'):
+            market = Marketplace(3, locking=locking)
+            producer_id = market.register_producer()
+            self.assertEqual(market.publish_many(producer_id, self.tea_1, 2), 2)
+            self.assertEqual(market.publish_many(producer_id, self.tea_2, 5), 1)
+            self.assertEqual(market.publish_many(producer_id, self.tea_2, 5), 0)
+            self.assertEqual(market.inventory.producer_queue, {producer_id: 3})
+
+            self.assertEqual(market.add_many(market.new_cart(), self.tea_1, 2), 2)
+            self.assertEqual(market.publish_many(producer_id, self.tea_2, 5, timeout=1), 2)
+            self.assertEqual(market.inventory.available(1), 3)
+
+    def publish_units(self, market, producer_id, published, peaks):
+        """Publishes units one by one, noting the queue size after every success."""
+        count = 0
+        for _ in range(200):
+            if market.publish(producer_id, self.tea_1):
+                count += 1
+                peaks.append(market.inventory.producer_queue[producer_id])
+        published.append(count)
+
+    def add_units(self, market, added):
+        """Adds units to a new cart one by one."""
+        cart_id = market.new_cart()
+        added.append(sum(market.add_to_cart(cart_id, self.tea_1) for _ in range(100)))
+
+    def test_concurrent_back_pressure(self):
+        """Concurrent publishers never overfill a producer's queue, in both locking modes."""
+        for locking in ('global', 'striped'):
+            market = Marketplace(5, locking=locking)
+            producer_id = market.register_producer()
+            published = []
+            added = []
+            # the sizes of the queue seen while the threads run
+            peaks = []
+
+            threads = ([threading.Thread(target=self.publish_units,
+                                         args=(market, producer_id, published, peaks))
+                        for _ in range(4)] +
+                       [threading.Thread(target=self.add_units, args=(market, added))
+                        for _ in range(4)])
+            for thread in threads:
+                thread.start()
+            while any(thread.is_alive() for thread in threads):
+                peaks.append(market.inventory.producer_queue[producer_id])
+            for thread in threads:
+                thread.join()
+
+            self.assertLessEqual(max(peaks), 5)
+            # every unit that was published is either in a cart or still in the queue
+            in_queue = market.inventory.producer_queue[producer_id]
+            self.assertLessEqual(in_queue, 5)
+            self.assertEqual(market.inventory.available(0), in_queue)
+            self.assertEqual(sum(published), sum(added) + in_queue)
+
+
+class TestHolds(MarketplaceTestCase):
+    """Test the holds of the units added to a cart."""
+
+    def test_hold_ttl(self):
+        """Units not ordered within the hold TTL go back to the inventory."""
+        market = Marketplace(3, hold_ttl=10, order_sink=OrderSink(io.StringIO()))
+        market.register_producer()
+        market.publish(0, self.tea_1)
+        market.publish(0, self.tea_1)
+        first, second = market.new_cart(), market.new_cart()
+
+        with mock.patch('time.monotonic', return_value=100):
+            self.assertEqual(market.add_many(first, self.tea_1, 2), 2)
+            self.assertEqual(market.add_to_cart(second, self.tea_1), False)
+        with mock.patch('time.monotonic', return_value=105):
+            # the oldest hold is the one dropped, the new unit is held until 115
+            self.assertEqual(market.remove_from_cart(first, self.tea_1), True)
+            self.assertEqual(market.add_to_cart(first, self.tea_1), True)
+        with mock.patch('time.monotonic', return_value=110):
+            self.assertEqual(market.add_to_cart(second, self.tea_1), True)
+            self.assertEqual(market.add_to_cart(second, self.tea_1), False)
+        with mock.patch('time.monotonic', return_value=115):
+            # the owner of the cart is told about the units it lost
+            with self.assertRaises(HoldExpired) as expired:
+                market.place_order(first)
+            self.assertEqual(expired.exception.units, {self.tea_1: 2})
+            self.assertEqual(market.take_expired(first), {})
+            self.assertEqual(market.order_sink.stream.getvalue(), '')
+            self.assertEqual(market.inventory.available(0), 1)
+            self.assertEqual(market.hold_deadlines, [(120, second, 0)])
+            market.place_order(first)
+            self.assertEqual(market.order_sink.stream.getvalue(), '')
+
+    def test_hold_timer(self):
+        """The holds expire when their deadline passes, without another call."""
+        market = Marketplace(3, hold_ttl=0.05, order_sink=OrderSink(io.StringIO()))
+        market.register_producer()
+        market.publish(0, self.tea_1)
+        cart_id = market.new_cart()
+        self.assertEqual(market.add_to_cart(cart_id, self.tea_1), True)
+
+        time.sleep(0.5)
+        self.assertEqual(market.inventory.available(0), 1)
+        self.assertEqual(market.take_expired(cart_id), {self.tea_1: 1})
+
+    def test_consumer_hold_ttl(self):
+        """A consumer adds again the units whose holds expired and orders all of them."""
+        market = Marketplace(5, hold_ttl=0.05, order_sink=OrderSink(io.StringIO()))
+        producer_id = market.register_producer()
+        self.assertEqual(market.publish_many(producer_id, self.tea_1, 3), 3)
+
+        # the holds of tea_1 expire while the consumer waits for tea_2
+        consumer = Consumer([[{"type": "add", "product": self.tea_1, "quantity": 3},
+                              {"type": "add", "product": self.tea_2, "quantity": 1},
+                              {"type": "remove", "product": self.tea_1, "quantity": 1}],
+                             [{"type": "add", "product": self.tea_2, "quantity": 1}]],
+                            market, 0.01, name="cons1", daemon=True)
+        consumer.start()
+        time.sleep(0.3)
+        self.assertEqual(market.publish_many(producer_id, self.tea_2, 2, timeout=5), 2)
+        consumer.join(5)
+
+        self.assertEqual(consumer.is_alive(), False)
+        self.assertEqual(sorted(market.order_sink.stream.getvalue().splitlines()),
+                         sorted([f"cons1 bought {self.tea_1}"] * 2 +
+                                [f"cons1 bought {self.tea_2}"] * 2))
+        self.assertEqual(market.inventory.available(0), 1)
+
+
+class TestFairness(MarketplaceTestCase):
+    """Test the fair hand-off of the units."""
+
+    def test_fair_handoff(self):
+        """A fair Marketplace gives a published unit to the oldest waiter."""
+        market = Marketplace(3, fair=True)
+        market.register_producer()
+        carts = [market.new_cart() for _ in range(3)]
+        added = []
+
+        def add(cart_id):
+            added.append((cart_id, market.add_to_cart(cart_id, self.tea_1, timeout=None)))
+
+        threads = []
+        for cart_id in carts[:2]:
+            threads.append(threading.Thread(target=add, args=(cart_id,)))
+            threads[-1].start()
+            # the queue of the product is created by the first waiter
+            while len(getattr(market.waiter_queues.get(0), 'waiters', ())) < len(threads):
+                time.sleep(0.001)
+
+        self.assertEqual(market.publish(0, self.tea_1), True)
+        threads[0].join()
+        # the unit went to the first waiter; a newcomer does not overtake the second one
+        self.assertEqual(added, [(carts[0], True)])
+        self.assertEqual(market.add_to_cart(carts[2], self.tea_1), False)
+
+        self.assertEqual(market.remove_from_cart(carts[0], self.tea_1), True)
+        threads[1].join()
+        self.assertEqual(added, [(carts[0], True), (carts[1], True)])
+        self.assertEqual(market.inventory.producer_queue, {0: 0})
+
+
+class TestTrace(MarketplaceTestCase):
+    """Test the trace of the Marketplace calls."""
+
+    def test_trace(self):
+        """A traced Marketplace records every call with its ids, product and result."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'trace.bin')
+            recorder = tr.TraceRecorder(filename, 3)
+            market = Marketplace(3, order_sink=OrderSink(io.StringIO()), trace=recorder)
+            producer_id = market.register_producer()
+            market.publish_many(producer_id, self.tea_1, 2)
+            cart_id = market.new_cart()
+            market.add_to_cart(cart_id, self.tea_2)
+            market.add_many(cart_id, self.tea_1, 3)
+            market.remove_from_cart(cart_id, self.tea_1)
+            market.place_order(cart_id)
+            recorder.close(market.catalog)
+
+            footer, records = tr.read_trace(filename)
+
+        self.assertEqual(footer["threads"], [threading.current_thread().name])
+        self.assertEqual([product["product_type"] for product in footer["products"]],
+                         ["Tea", "Tea"])
+        self.assertEqual([record[2:] for record in records],
+                         [(ops.REGISTER_PRODUCER, 0, -1, 0, 0), (ops.PUBLISH_MANY, 0, 0, 2, 2),
+                          (ops.NEW_CART, 1, -1, 0, 1), (ops.ADD_TO_CART, 1, 1, 1, 0),
+                          (ops.ADD_MANY, 1, 0, 3, 2), (ops.REMOVE_FROM_CART, 1, 0, 1, 1),
+                          (ops.PLACE_ORDER, 1, -1, 0, 1)])
+
+
+class TestMetrics(MarketplaceTestCase):
+    """Test the instrumentation of the Marketplace."""
+
+    def test_metrics(self):
+        """The instrumented Marketplace times its locks and counts the rejections."""
+        conditions = ['space_available', 'item_available', 'hold_lock']
+        for locking, locks in (('global', ['modify_cart']), ('striped', ['stripe', 'producer'])):
+            market = Marketplace(1, locking=locking, metrics=Metrics(), hold_ttl=60)
+            producer_id = market.register_producer()
+            self.assertEqual(market.publish(producer_id, self.tea_1), True)
+            self.assertEqual(market.publish(producer_id, self.tea_1), False)
+            self.assertEqual(market.add_to_cart(market.new_cart(), self.tea_2), False)
+
+            snapshot = market.metrics.snapshot()
+            self.assertEqual(sorted(snapshot["locks"]), sorted(locks + conditions))
+            self.assertEqual(snapshot["rejected"],
+                             {"publish": {"by_product": {0: 1}, "by_producer": {0: 1}},
+                              "add": {"by_product": {1: 1}, "by_producer": {}}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+This module tests the Marketplace's instrumentation.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import math
+import threading
+import unittest
+
+from tema.metrics import Histogram, Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Test metrics."""
+
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_histogram(self):
+        """The buckets are cumulative and include their upper bound."""
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.snapshot(),
+                         {"buckets": {1: 2, 10: 3, math.inf: 4}, "count": 4, "sum": 56.5,
+                          "max": 50})
+
+    def test_lock(self):
+        """The locks with the same name share their histograms."""
+        for lock in (self.metrics.new_lock('stripe'), self.metrics.new_lock('stripe')):
+            with lock:
+                self.assertEqual(lock.acquire(blocking=False), False)
+
+        locks = self.metrics.snapshot()["locks"]
+        self.assertEqual(list(locks), ['stripe'])
+        self.assertEqual(locks['stripe']['wait']['count'], 2)
+        self.assertEqual(locks['stripe']['hold']['count'], 2)
+
+    def test_condition(self):
+        """A condition over an instrumented lock times its waits for the lock."""
+        condition = threading.Condition(self.metrics.new_lock('item_available'))
+        with condition:
+            self.assertEqual(condition.wait(0.01), False)
+            condition.notify()
+
+        locks = self.metrics.snapshot()["locks"]
+        self.assertEqual(locks['item_available']['wait']['count'], 2)
+        self.assertEqual(locks['item_available']['hold']['count'], 2)
+        self.assertRaises(RuntimeError, condition.notify)
+
+    def test_snapshot(self):
+        """Rejections are counted per product and per producer, retry waits per role."""
+        self.metrics.rejected('publish', 1, 0)
+        self.metrics.rejected('publish', 1, 0)
+        self.metrics.rejected('add', 2)
+        self.metrics.retried('consumer', 0.5)
+        self.metrics.retried('consumer', 0.25)
+        self.metrics.waited('cons1', 0.5)
+        self.metrics.waited('cons1', 2)
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["rejected"],
+                         {"publish": {"by_product": {1: 2}, "by_producer": {0: 2}},
+                          "add": {"by_product": {2: 1}, "by_producer": {}}})
+        self.assertEqual(snapshot["retry_wait_seconds"], {"consumer": 0.75})
+        self.assertEqual(snapshot["consumer_waits"]["cons1"]["count"], 2)
+        self.assertEqual(snapshot["consumer_waits"]["cons1"]["max"], 2)
+
+    def test_prometheus(self):
+        """The export has a sample for every bucket, rejection and role."""
+        with self.metrics.new_lock('modify_cart'):
+            pass
+        self.metrics.rejected('publish', 1, 0)
+        self.metrics.retried('producer', 0.5)
+        self.metrics.waited('cons1', 0.5)
+
+        text = self.metrics.prometheus()
+        self.assertIn('marketplace_lock_wait_seconds_bucket{lock="modify_cart",le="+Inf"} 1\n',
+                      text)
+        self.assertIn('marketplace_lock_hold_seconds_count{lock="modify_cart"} 1\n', text)
+        self.assertIn('marketplace_rejected_by_producer_total{operation="publish",'
+                      'producer="0"} 1\n', text)
+        self.assertIn('marketplace_rejected_by_product_total{operation="publish",product="1"} 1\n',
+                      text)
+        self.assertIn('marketplace_retry_wait_seconds_total{role="producer"} 0.5\n', text)
+        self.assertIn('marketplace_consumer_wait_seconds_bucket{consumer="cons1",le="1.0"} 1\n',
+                      text)
+        self.assertIn('marketplace_consumer_wait_max_seconds{consumer="cons1"} 0.5\n', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+This module tests the Marketplace shared by processes.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import io
+import multiprocessing
+import threading
+import unittest
+
+from tema.catalog import ProductCatalog
+from tema.order_sink import OrderSink
+from tema.product import Tea
+from tema.shared_marketplace import SharedInventory, SharedMarketplace, run_processes
+
+
+class TestSharedMarketplace(unittest.TestCase):
+    """Test multiprocess marketplace."""
+
+    def setUp(self):
+        self.tea_1 = Tea('Wild Cherry', 5, 'Black')
+        self.tea_2 = Tea('Cactus fig', 3, 'Green')
+        self.catalog = ProductCatalog([self.tea_1, self.tea_2])
+
+    def test_shared_inventory(self):
+        """The shared inventory serves the producers with lower ids first."""
+        inventory = SharedInventory(2, len(self.catalog), 2)
+        self.assertEqual([inventory.new_producer() for _ in range(2)], [0, 1])
+        self.assertRaises(ValueError, inventory.new_producer)
+
+        self.assertEqual(inventory.put(1, 0), True)
+        self.assertEqual(inventory.put(0, 0), True)
+        self.assertEqual(inventory.put(0, 1), True)
+        self.assertEqual(inventory.put(0, 1), False)
+
+        self.assertEqual(inventory.reserve_many(0, 3, partial=False), {})
+        self.assertEqual(inventory.reserve_many(0, 3), {0: 1, 1: 1})
+        self.assertEqual(inventory.available(0), 0)
+        inventory.release(1, 0)
+        self.assertEqual(inventory.available(0), 1)
+        self.assertEqual(list(inventory.producer_queue), [1, 1])
+
+    def test_marketplace(self):
+        """A worker's marketplace over the shared inventory."""
+        market = SharedMarketplace(SharedInventory(3, len(self.catalog), 1),
+                                   order_sink=OrderSink(io.StringIO()), catalog=self.catalog)
+        producer_id = market.register_producer()
+        self.assertEqual(market.publish(producer_id, self.tea_1), True)
+        cart_id = market.new_cart()
+        self.assertEqual(market.add_to_cart(cart_id, self.tea_2), False)
+        self.assertEqual(market.add_to_cart(cart_id, self.tea_1), True)
+        market.place_order(cart_id)
+        self.assertEqual(market.order_sink.stream.getvalue(),
+                         f"{threading.current_thread().name} bought {self.tea_1}\n")
+
+    def test_run_processes(self):
+        """Every unit that the consumers buy is ordered once, from two workers."""
+        producers = [{"name": f"prod{i}", "products": [(self.tea_1, 2, 0), (self.tea_2, 1, 0)],
+                      "republish_wait_time": 0.01} for i in range(2)]
+        consumers = [{"name": f"cons{i}", "retry_wait_time": 0.01,
+                      "carts": [[{"type": "add", "product": self.tea_1, "quantity": 2},
+                                 {"type": "add", "product": self.tea_2, "quantity": 1},
+                                 {"type": "remove", "product": self.tea_1, "quantity": 1}]]}
+                     for i in range(3)]
+        market_config = {"producers": producers, "consumers": consumers,
+                         "marketplace": {"queue_size_per_producer": 4}}
+
+        output = io.StringIO()
+        run_processes(market_config, self.catalog, 2, log_mode='off', stream=output)
+        self.assertEqual(sorted(output.getvalue().splitlines()),
+                         sorted(f"cons{i} bought {tea}" for i in range(3)
+                                for tea in (self.tea_1, self.tea_2)))
+
+    def test_worker_died(self):
+        """The other workers are stopped when a worker dies."""
+        # the first worker fails to create its producer, the second one waits for the parent
+        producers = [{"name": "prod0"},
+                     {"name": "prod1", "products": [(self.tea_1, 1, 0)],
+                      "republish_wait_time": 0.01}]
+        market_config = {"producers": producers, "consumers": [],
+                         "marketplace": {"queue_size_per_producer": 4}}
+
+        with self.assertRaises(RuntimeError):
+            run_processes(market_config, self.catalog, 2, log_mode='off', stream=io.StringIO())
+        self.assertEqual(multiprocessing.active_children(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+This module tests the simulated event loop.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import asyncio
+import unittest
+
+from tema.simulation import check_config, run_simulation
+
+
+class TestSimulation(unittest.TestCase):
+    """Test simulation event loop."""
+
+    def test_sleep(self):
+        """The sleeps advance the virtual clock at once."""
+        async def sleeper():
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(asyncio.sleep(3600), asyncio.sleep(60))
+            return loop.time()
+
+        self.assertAlmostEqual(run_simulation(sleeper()), 3600, places=4)
+
+    def test_order(self):
+        """The tasks wake up in the order of their virtual times."""
+        woken = []
+
+        async def sleeper(name, delay):
+            await asyncio.sleep(delay)
+            woken.append(name)
+
+        async def sleepers():
+            await asyncio.gather(sleeper('b', 0.2), sleeper('c', 0.3), sleeper('a', 0.1))
+
+        run_simulation(sleepers())
+        self.assertEqual(woken, ['a', 'b', 'c'])
+
+    def test_timeout(self):
+        """A wait with a timeout ends when the virtual clock reaches it."""
+        async def waiter():
+            condition = asyncio.Condition()
+            async with condition:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(condition.wait(), 0.5)
+
+            return asyncio.get_running_loop().time()
+
+        self.assertAlmostEqual(run_simulation(waiter()), 0.5, places=4)
+
+    def test_busy_retry(self):
+        """A task that retries without waiting does not keep the timers from expiring."""
+        async def producer(stock):
+            await asyncio.sleep(0.001)
+            stock.append('unit')
+
+        async def consumer(stock):
+            while not stock:
+                await asyncio.sleep(0)
+
+            return asyncio.get_running_loop().time()
+
+        async def market():
+            stock = []
+            return (await asyncio.gather(producer(stock), consumer(stock)))[1]
+
+        self.assertAlmostEqual(run_simulation(market()), 0.001, places=4)
+
+    def test_check_config(self):
+        """The configurations whose actors retry without waiting are rejected."""
+        market_config = {'producers': [{'name': 'prod1', 'republish_wait_time': 0.1}],
+                         'consumers': [{'name': 'cons1', 'retry_wait_time': 0.1}]}
+        check_config(market_config)
+
+        market_config['consumers'].append({'name': 'cons2', 'retry_wait_time': 0})
+        self.assertRaises(ValueError, check_config, market_config)
+
+    def test_deadlock(self):
+        """Waiting for nothing that can ever happen fails instead of hanging."""
+        async def waiter():
+            await asyncio.Event().wait()
+
+        self.assertRaises(RuntimeError, run_simulation, waiter())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+This module tests the trace recording.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+from tema.catalog import ProductCatalog
+from tema.product import Tea
+from tema.opcodes import ADD_MANY, PLACE_ORDER
+from tema.trace import TraceRecorder, read_trace
+
+
+class TestTrace(unittest.TestCase):
+    """Test trace recording."""
+
+    def test_record(self):
+        """The records of every thread are kept in order, through the reused buffers."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'trace.bin')
+            recorder = TraceRecorder(filename, 3, buffer_records=2)
+
+            def calls(cart_id):
+                for quantity in range(5):
+                    recorder.record(ADD_MANY, cart_id, 0, quantity, quantity)
+
+            threads = [threading.Thread(target=calls, args=(cart_id,), name=f'cons{cart_id}')
+                       for cart_id in (1, 2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            recorder.close(ProductCatalog([Tea('Linden', 9, 'Herbal')]))
+            recorder.record(PLACE_ORDER, 1, -1, 0, 0)
+            footer, records = read_trace(filename)
+
+        self.assertEqual(sorted(footer["threads"]), ['cons1', 'cons2'])
+        self.assertEqual(footer["products"], [{"product_type": "Tea", "name": "Linden",
+                                               "price": 9, "type": "Herbal"}])
+        self.assertEqual(footer["queue_size_per_producer"], 3)
+        self.assertEqual(len(records), 10)
+        for index, name in enumerate(footer["threads"]):
+            thread_records = [record for record in records if record[1] == index]
+            self.assertEqual([record[2:] for record in thread_records],
+                             [(ADD_MANY, int(name[-1]), 0, quantity, quantity)
+                              for quantity in range(5)])
+            times = [record[0] for record in thread_records]
+            self.assertEqual(times, sorted(times))
+
+    def test_close_while_recording(self):
+        """A thread that keeps recording while the recorder is closed loses no record."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'trace.bin')
+            recorder = TraceRecorder(filename, 3, buffer_records=3)
+            started = threading.Event()
+            stop = threading.Event()
+
+            def calls():
+                quantity = 0
+                while not stop.is_set():
+                    recorder.record(ADD_MANY, 1, 0, quantity, quantity)
+                    quantity += 1
+                    if quantity == 100:
+                        started.set()
+
+            # switches between the threads as often as possible, in the middle of records
+            switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+            try:
+                thread = threading.Thread(target=calls, daemon=True)
+                thread.start()
+                started.wait()
+                recorder.close(ProductCatalog([Tea('Linden', 9, 'Herbal')]))
+                stop.set()
+                thread.join()
+            finally:
+                sys.setswitchinterval(switch_interval)
+            _, records = read_trace(filename)
+
+        self.assertGreaterEqual(len(records), 100)
+        self.assertEqual([record[5] for record in records], list(range(len(records))))
+
+
+if __name__ == '__main__':
+    unittest.main()
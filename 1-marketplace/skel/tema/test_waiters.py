@@ -0,0 +1,86 @@
+"""
+This module tests the queues of the waiting consumers.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import threading
+import unittest
+
+from tema.waiters import WaiterQueue
+
+
+class TestWaiterQueue(unittest.TestCase):
+    """Test waiter queues."""
+
+    def setUp(self):
+        self.stock = 0
+        self.queue = WaiterQueue(self.reserve)
+
+    def reserve(self, quantity, partial):
+        """Takes units out of self.stock, all owned by producer 0."""
+        count = min(quantity, self.stock)
+        if not count or (not partial and count < quantity):
+            return {}
+
+        self.stock -= count
+        return {0: count}
+
+    def start_waiter(self, quantity, partial, results):
+        """Starts a thread that waits and appends what it got, once it is queued."""
+        queued = len(self.queue.waiters) + 1
+        thread = threading.Thread(target=lambda: results.append(
+            (quantity, self.queue.wait(quantity, partial, None))))
+        thread.start()
+        while len(self.queue.waiters) < queued:
+            threading.Event().wait(0.001)
+
+        return thread
+
+    def test_immediate(self):
+        """Without waiters, the available units are taken at once."""
+        self.stock = 2
+        self.assertEqual(self.queue.wait(3, True, 0), {0: 2})
+        self.assertEqual(self.queue.wait(1, True, 0), None)
+        self.assertEqual(self.queue.wait(1, True, 0.01), None)
+        self.assertEqual(len(self.queue.waiters), 0)
+
+    def test_fifo(self):
+        """The units go to the oldest waiter, that can hold back the next ones."""
+        results = []
+        threads = [self.start_waiter(2, False, results), self.start_waiter(1, True, results)]
+
+        self.stock = 1
+        self.queue.hand_off()
+        # a newcomer does not overtake the waiters
+        self.assertEqual(self.queue.wait(1, True, 0), None)
+        self.assertEqual(results, [])
+
+        self.stock = 3
+        self.queue.hand_off()
+        for thread in threads:
+            thread.join()
+
+        self.assertCountEqual(results, [(2, {0: 2}), (1, {0: 1})])
+        self.assertEqual(self.stock, 0)
+
+    def test_timeout(self):
+        """A waiter that times out leaves the queue and lets the next ones be served."""
+        results = []
+        self.stock = 1
+        blocked = threading.Thread(target=lambda: self.queue.wait(2, False, 0.05))
+        blocked.start()
+        while not self.queue.waiters:
+            threading.Event().wait(0.001)
+        thread = self.start_waiter(1, True, results)
+
+        blocked.join()
+        thread.join()
+        self.assertEqual(results, [(1, {0: 1})])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
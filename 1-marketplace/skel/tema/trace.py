@@ -0,0 +1,219 @@
+"""
+This module records the Marketplace's operations in a compact binary trace, that
+benchmarks.replay drives against other Marketplaces.
+
+A trace file starts with MAGIC, goes on with fixed-size RECORDs, one for every
+Marketplace call, and ends with a JSON footer followed by its length. The footer
+holds the names of the threads, the products, in the product ids' order, and the
+size of the producers' queues.
+
+Every thread packs its records into a buffer of its own, so that recording takes
+no lock. The buffer is reused once full: its records are copied out and written to
+the file by a background thread. The threads may keep calling the Marketplace while
+the recorder is closed, such as the daemon producers: their calls are dropped, and
+the close waits for the records that are being packed.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import json
+import struct
+import threading
+import time
+from dataclasses import asdict, dataclass
+from queue import SimpleQueue
+
+
+MAGIC = b'MKTTRACE1'
+# nanoseconds since the recording started, thread index, operation (see tema.opcodes),
+# owner (the producer id of the producers' operations, the cart id of the carts' ones),
+# product id (-1 if the operation has none), quantity and result (the returned id,
+# number of units or boolean)
+RECORD = struct.Struct('<qHBxiiii')
+FOOTER_LENGTH = struct.Struct('<Q')
+DEFAULT_BUFFER_RECORDS = 4096
+
+# bound once, record() is on the Marketplace's hot path
+_pack_into = RECORD.pack_into
+_clock = time.perf_counter_ns
+
+# put in the queue to stop the writer
+_STOP = None
+
+
+@dataclass(slots=True)
+class TraceBuffer:
+    """
+    Class that holds the records of a thread until they are written.
+    """
+    index: int
+    data: bytearray
+    offset: int = 0
+    # set while the owner packs a record, see TraceRecorder.close
+    busy: bool = False
+
+
+class TraceWriter:
+    """
+    Class that writes the chunks of records to the trace file from a background thread.
+    """
+
+    def __init__(self, filename):
+        """
+        Constructor
+
+        :type filename: String
+        :param filename: the trace file
+        """
+
+        self.file = open(filename, 'wb')  # pylint: disable=consider-using-with
+        self.file.write(MAGIC)
+        self.chunks = SimpleQueue()
+        self.thread = threading.Thread(target=self._write, name='marketplace-trace',
+                                       daemon=True)
+        self.thread.start()
+
+    def put(self, chunk):
+        """
+        Queues a chunk of records to be written.
+        """
+        self.chunks.put(chunk)
+
+    def close(self, footer):
+        """
+        Writes the queued chunks and the footer, and closes the file.
+
+        :type footer: Bytes
+        :param footer: the encoded footer, see the module documentation
+        """
+        self.chunks.put(_STOP)
+        self.thread.join()
+
+        self.file.write(footer)
+        self.file.write(FOOTER_LENGTH.pack(len(footer)))
+        self.file.close()
+
+    def _write(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is _STOP:
+                return
+
+            self.file.write(chunk)
+
+
+class TraceRecorder:
+    """
+    Class that writes the records of the Marketplace calls to a trace file.
+    """
+
+    def __init__(self, filename, queue_size_per_producer,
+                 buffer_records=DEFAULT_BUFFER_RECORDS):
+        """
+        Constructor
+
+        :type filename: String
+        :param filename: the trace file
+
+        :type queue_size_per_producer: Int
+        :param queue_size_per_producer: the queue size of the recorded Marketplace
+
+        :type buffer_records: Int
+        :param buffer_records: the number of records that every thread keeps before
+        they are written
+        """
+
+        self.queue_size_per_producer = queue_size_per_producer
+        self.buffer_records = buffer_records
+        self.start = time.perf_counter_ns()
+        self.local = threading.local()
+        # the buffers and the names of the threads, by thread index
+        self.buffers = []
+        self.thread_names = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+        self.writer = TraceWriter(filename)
+
+    def record(self, operation, owner, product_id, quantity, result):
+        """
+        Records a Marketplace call made by the current thread. The calls made after
+        the recorder is closed are dropped.
+        """
+        if self.closed:
+            return
+
+        try:
+            buffer = self.local.buffer
+        except AttributeError:
+            buffer = self._new_buffer()
+
+        # checked again once busy is set: either close sees the buffer busy and waits,
+        # or this call sees the recorder closed
+        buffer.busy = True
+        if not self.closed:
+            _pack_into(buffer.data, buffer.offset, _clock() - self.start,
+                       buffer.index, operation, owner, product_id, quantity, result)
+            buffer.offset += RECORD.size
+            if buffer.offset == len(buffer.data):
+                self.writer.put(bytes(buffer.data))
+                buffer.offset = 0
+        buffer.busy = False
+
+    def close(self, catalog):
+        """
+        Writes the records that the threads still keep and the footer, and closes
+        the file. The calls recorded from now on are dropped.
+
+        :type catalog: ProductCatalog
+        :param catalog: the catalog of the recorded Marketplace
+        """
+        self.closed = True
+        with self.lock:
+            for buffer in self.buffers:
+                # the owner is packing a record, that it started before the close
+                while buffer.busy:
+                    time.sleep(0)
+                self.writer.put(bytes(buffer.data[:buffer.offset]))
+                buffer.offset = 0
+
+        self.writer.close(json.dumps({
+            "threads": self.thread_names,
+            "products": [{"product_type": type(product).__name__, **asdict(product)}
+                         for product in catalog.products],
+            "queue_size_per_producer": self.queue_size_per_producer,
+        }).encode())
+
+    def _new_buffer(self):
+        with self.lock:
+            buffer = TraceBuffer(len(self.buffers),
+                                 bytearray(self.buffer_records * RECORD.size))
+            self.buffers.append(buffer)
+            self.thread_names.append(threading.current_thread().name)
+
+        self.local.buffer = buffer
+        return buffer
+
+
+def read_trace(filename):
+    """
+    Reads a trace file.
+
+    :returns a pair: the footer, see the module documentation, and the list of the
+    records, as tuples of the RECORD fields; the records of every thread are in the
+    order they were made, but the threads' records are interleaved in chunks
+    """
+    with open(filename, 'rb') as trace_file:
+        data = trace_file.read()
+
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{filename} is not a marketplace trace")
+
+    (footer_length,) = FOOTER_LENGTH.unpack_from(data, len(data) - FOOTER_LENGTH.size)
+    footer_start = len(data) - FOOTER_LENGTH.size - footer_length
+    footer = json.loads(data[footer_start:len(data) - FOOTER_LENGTH.size])
+    records = list(RECORD.iter_unpack(memoryview(data)[len(MAGIC):footer_start]))
+
+    return footer, records
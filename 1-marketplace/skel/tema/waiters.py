@@ -0,0 +1,91 @@
+"""
+This module represents the queues of the consumers that wait for a product.
+
+Computer Systems Architecture Course
+Assignment 1
+March 2021
+"""
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class Waiter:
+    """
+    Class that represents a consumer waiting for units of a product.
+    """
+    quantity: int
+    partial: bool
+    # producer_id -> number of units, set when the units are handed off
+    owners: dict = None
+    event: threading.Event = field(default_factory=threading.Event)
+
+
+class WaiterQueue:
+    """
+    Class that hands off the units of a product to the consumers that wait for it, in
+    the order they started waiting. A consumer that arrives while others wait queues
+    behind them, even if some units are available, so that nobody is overtaken.
+    """
+
+    def __init__(self, reserve):
+        """
+        Constructor
+
+        :type reserve: Callable
+        :param reserve: reserve(quantity, partial) takes units of the product out of the
+        inventory, see Inventory.reserve_many, and returns their owners or an empty dict
+        """
+
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        self.waiters = deque()
+
+    def wait(self, quantity, partial, timeout):
+        """
+        Takes up to quantity units, waiting for at most timeout seconds for them to be
+        handed off; 0 returns at once and None waits until they are.
+
+        :returns a dictionary producer_id -> number of units, or None
+        """
+        with self.lock:
+            if not self.waiters:
+                owners = self.reserve(quantity, partial)
+                if owners or timeout == 0:
+                    return owners or None
+            elif timeout == 0:
+                return None
+
+            waiter = Waiter(quantity, partial)
+            self.waiters.append(waiter)
+
+        waiter.event.wait(timeout)
+
+        with self.lock:
+            if waiter.owners is None:
+                self.waiters.remove(waiter)
+                # a waiter that could not be served may have held back the next ones
+                self._serve()
+
+        return waiter.owners
+
+    def hand_off(self):
+        """
+        Hands off the available units to the oldest waiters, until one of them cannot
+        be served.
+        """
+        with self.lock:
+            self._serve()
+
+    def _serve(self):
+        while self.waiters:
+            waiter = self.waiters[0]
+            owners = self.reserve(waiter.quantity, waiter.partial)
+            if not owners:
+                return
+
+            self.waiters.popleft()
+            waiter.owners = owners
+            waiter.event.set()
@@ -11,3 +11,10 @@ python3 test_generator.py 08 10 50 5 40 1 5
 python3 test_generator.py 09 20 5 2 25 1 2
 python3 test_generator.py 10 50 200 10 40 1 5
 
+
+# usage: load_test_generator.py [-h] [--consumers N] [--products N] [--operations N]
+#                               [--zipf EXPONENT] [--ops-per-cart N] [--max-quantity N] [--removals SHARE]
+#                               [--queue-fraction F] [--produce-time S] [--retry-time S] [--seed N]
+#                               [--tests-dir DIR] test_name
+# large-scale load tests, e.g. a million operations over a thousand products:
+# PYTHONPATH=.. python3 load_test_generator.py load --operations 1000000 --products 1000 --zipf 1.2
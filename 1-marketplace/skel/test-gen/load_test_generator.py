@@ -0,0 +1,264 @@
+"""
+Generates large-scale load tests: synthetic product catalogs of any size, product
+popularity that follows a Zipf distribution and millions of cart operations.
+
+The input and reference output files are written as the operations are generated,
+so the memory taken is proportional to the number of products and to the size of a
+cart, whatever the number of operations. The consumers' carts are generated twice
+from the same seed: a first pass only counts the demand of every product, that sizes
+the producers, and the second one writes the consumers and their purchases.
+
+Every product is made by a producer of its own, that makes in every cycle as many
+units as the consumers add to their carts in total. The producers' queues only hold a
+fraction of the largest cycle, so that the producers of the popular products block
+when the consumers fall behind, and the consumers wait and retry for those products.
+The tests cannot deadlock: a producer only blocks when its queue is full, so when
+its product is available, and the consumers only wait for the products that are
+not, whose producers keep making them.
+
+Script input
+    - test file name
+    - number of consumers, products and cart operations
+    - Zipf exponent of the product popularity, 0 for a uniform popularity
+    - operations per cart, maximum quantity of an operation, share of removals
+    - size of the producers' queues, as a fraction of the largest cycle
+    - producers' and consumers' wait times
+"""
+import argparse
+import bisect
+import itertools
+import json
+import math
+import random
+
+from tema.product import Coffee, Tea
+from test_generator import generate_marketplace
+from test_utils import *  # pylint: disable=wildcard-import, unused-wildcard-import
+
+DEFAULT_LOAD_CONSUMERS = 200
+DEFAULT_LOAD_PRODUCTS = 1000
+DEFAULT_LOAD_OPERATIONS = 10 ** 6
+DEFAULT_ZIPF_EXPONENT = 1.0
+DEFAULT_OPERATIONS_PER_CART = 20
+DEFAULT_MAX_QUANTITY = 5
+DEFAULT_REMOVAL_SHARE = 0.1
+DEFAULT_QUEUE_FRACTION = 0.1
+# the tests run as fast as the marketplace allows, the waits only pace the retries
+DEFAULT_PRODUCE_TIME = 0.0
+DEFAULT_RETRY_TIME = 0.01
+
+
+def parse_input():
+    """
+    Parses command line input and returns the parameters.
+    :return: an argparse.Namespace with all the arguments of the script
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("test_name", help="Test file name (no extension)")
+    parser.add_argument("--consumers", type=int, default=DEFAULT_LOAD_CONSUMERS,
+                        help="number of consumers")
+    parser.add_argument("--products", type=int, default=DEFAULT_LOAD_PRODUCTS,
+                        help="number of products in the catalog")
+    parser.add_argument("--operations", type=int, default=DEFAULT_LOAD_OPERATIONS,
+                        help="total number of cart operations, spread over the consumers")
+    parser.add_argument("--zipf", type=float, default=DEFAULT_ZIPF_EXPONENT,
+                        help="exponent of the Zipf popularity of the products, "
+                             "0 makes them equally popular")
+    parser.add_argument("--ops-per-cart", type=int, default=DEFAULT_OPERATIONS_PER_CART,
+                        help="maximum number of operations in a cart")
+    parser.add_argument("--max-quantity", type=int, default=DEFAULT_MAX_QUANTITY,
+                        help="maximum quantity of an operation")
+    parser.add_argument("--removals", type=float, default=DEFAULT_REMOVAL_SHARE,
+                        help="share of the operations that remove products from a cart")
+    parser.add_argument("--queue-fraction", type=float, default=DEFAULT_QUEUE_FRACTION,
+                        help="size of the producers' queues, as a fraction of the units "
+                             "of the most popular product made in a cycle")
+    parser.add_argument("--produce-time", type=float, default=DEFAULT_PRODUCE_TIME,
+                        help="time the producers take to make a unit")
+    parser.add_argument("--retry-time", type=float, default=DEFAULT_RETRY_TIME,
+                        help="producers' and consumers' wait before retrying")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    parser.add_argument("--tests-dir", default=TESTS_DIR,
+                        help="directory the test files are written to")
+
+    args = parser.parse_args()
+    if min(args.consumers, args.products, args.operations,
+           args.ops_per_cart, args.max_quantity) <= 0 or not 0 <= args.removals < 1 \
+            or not 0 < args.queue_fraction <= 1:
+        parser.error("the counts must be positive, the share of removals in [0, 1) "
+                     "and the queue fraction in (0, 1]")
+
+    return args
+
+
+def generate_products(count):
+    """
+    Generates a synthetic catalog, half coffee and half tea, with unique names.
+    :param count: the number of products to generate
+    :return: a list of (product id, product description, Product), in id order
+    """
+    products = []
+    for i in range(count):
+        name = f"{i + 1:0{len(str(count))}d}"
+        price = i % 10 + 1
+        if i % 2 == 0:
+            description = {"product_type": "Coffee", "name": f"Coffee {name}", "price": price,
+                           "acidity": round(MIN_ACIDITY + (MAX_ACIDITY - MIN_ACIDITY)
+                                            * (i % 21) / 20, 2),
+                           "roast_level": ROAST_LEVEL[i % len(ROAST_LEVEL)]}
+        else:
+            tea_type = list(TEA_NAMES_TYPES.values())[i % len(TEA_NAMES_TYPES)]
+            description = {"product_type": "Tea", "name": f"Tea {name}", "price": price,
+                           "type": tea_type}
+
+        params = {k: v for k, v in description.items() if k != "product_type"}
+        product_class = Coffee if description["product_type"] == "Coffee" else Tea
+        products.append((PRODUCT_PREFIX + str(i + 1), description, product_class(**params)))
+
+    return products
+
+
+def zipf_cumulative_weights(count, exponent):
+    """
+    Returns the cumulative weights of count products whose popularity follows a Zipf
+    distribution: the product of rank k is chosen with a probability proportional
+    to 1 / k ** exponent.
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def generate_carts(args, cumulative_weights):
+    """
+    Yields the carts of the consumers, consumer after consumer, as (consumer index,
+    operations, expected cart) triples. The same arguments yield the same carts.
+
+    An operation is an add of a product chosen by popularity, or, with the share of
+    removals, a removal of some units of a product already in the cart.
+    :return: a generator; the expected carts map product indexes to unit counts
+    """
+    rng = random.Random(args.seed)
+    total_weight = cumulative_weights[-1]
+
+    for consumer in range(args.consumers):
+        # the operations are spread evenly, the first consumers get the remainder
+        remaining = args.operations // args.consumers
+        if consumer < args.operations % args.consumers:
+            remaining += 1
+        while remaining:
+            num_operations = min(remaining, rng.randint(1, args.ops_per_cart))
+            remaining -= num_operations
+
+            operations = []
+            cart = {}
+            for _ in range(num_operations):
+                if cart and rng.random() < args.removals:
+                    product = rng.choice(list(cart))
+                    quantity = rng.randint(1, cart[product])
+                    operations.append((REMOVE_FROM_CART_OP, product, quantity))
+                    cart[product] -= quantity
+                    if not cart[product]:
+                        del cart[product]
+                else:
+                    product = bisect.bisect_left(cumulative_weights,
+                                                 rng.random() * total_weight)
+                    quantity = rng.randint(1, args.max_quantity)
+                    operations.append((ADD_TO_CART_OP, product, quantity))
+                    cart[product] = cart.get(product, 0) + quantity
+
+            yield consumer, operations, cart
+
+
+def count_demand(args, cumulative_weights):
+    """
+    Returns the number of units of every product that the consumers add to their carts.
+    """
+    demand = [0] * args.products
+    for _, operations, _ in generate_carts(args, cumulative_weights):
+        for op_type, product, quantity in operations:
+            if op_type == ADD_TO_CART_OP:
+                demand[product] += quantity
+
+    return demand
+
+
+def generate_producers(args, products, demand):
+    """
+    Generates the producers: every product that the consumers add to their carts is
+    made by a producer of its own, in the quantity that they demand.
+    :return: a list with all producers
+    """
+    producers = []
+    for k, count in enumerate(demand):
+        if count:
+            producers.append({"name": PRODUCER_NAME_PREFIX + str(len(producers) + 1),
+                              ARG_PRODUCTS: [[products[k][0], count, args.produce_time]],
+                              "republish_wait_time": args.retry_time})
+
+    return producers
+
+
+def queue_size_for(args, demand):
+    """
+    Returns the size of the producers' queues, the queue fraction of the demand of
+    the most popular product, see the module documentation.
+    """
+    return max(1, math.ceil(args.queue_fraction * max(demand)))
+
+
+def write_json_item(file, key, value, last=False):
+    """
+    Writes a "key": value member of the top-level object.
+    """
+    file.write(f"    {json.dumps(key)}: {json.dumps(value)}{'' if last else ','}\n")
+
+
+def generate_test():
+    """
+    Generates the test and writes the input and reference output files
+    :return: nothing
+    """
+    args = parse_input()
+
+    products = generate_products(args.products)
+    cumulative_weights = zipf_cumulative_weights(args.products, args.zipf)
+    demand = count_demand(args, cumulative_weights)
+    producers = generate_producers(args, products, demand)
+    queue_size = queue_size_for(args, demand)
+
+    product_lines = [repr(product) for _, _, product in products]
+    prefix = f"{args.tests_dir}/{args.test_name}"
+    with open(f"{prefix}.in", "w", encoding="utf-8") as input_file, \
+            open(f"{prefix}.ref.out", "w", encoding="utf-8") as output_file:
+        # the marketplace comes right after the products, so that test.py can start
+        # the producers and consumers while it reads them
+        input_file.write("{\n")
+        write_json_item(input_file, ARG_PRODUCTS,
+                        {product_id: description for product_id, description, _ in products})
+        write_json_item(input_file, "marketplace", generate_marketplace(queue_size))
+        write_json_item(input_file, ARG_PRODUCERS, producers)
+
+        input_file.write(f'    "{ARG_CONSUMERS}": [')
+        current = None
+        for consumer, operations, cart in generate_carts(args, cumulative_weights):
+            name = CONSUMER_NAME_PREFIX + str(consumer + 1)
+            if consumer != current:
+                if current is not None:
+                    input_file.write("\n        ]},")
+                input_file.write(f'\n        {{"name": "{name}", '
+                                 f'"retry_wait_time": {args.retry_time}, "carts": [\n')
+                current = consumer
+            else:
+                input_file.write(",\n")
+
+            input_file.write("            " + json.dumps(
+                [{"type": op_type, "product": products[product][0], "quantity": quantity}
+                 for op_type, product, quantity in operations]))
+
+            for product, count in sorted(cart.items()):
+                output_file.write(f"{name} bought {product_lines[product]}\n" * count)
+
+        input_file.write("\n        ]}\n    ]\n}\n")
+
+
+if __name__ == "__main__":
+    generate_test()
@@ -6,13 +6,60 @@ Assignment 1
 March 2020
 """
 
-import sys
-from json import loads
+# pylint: disable=import-outside-toplevel
+# the modules of the other engines and of the optional features are imported only
+# when they are used, test.py is started once per test; see benchmarks/startup.py
+import argparse
 
 from tema.producer import Producer
 from tema.consumer import Consumer
+from tema.catalog import ProductCatalog
+from tema.config_loader import iter_config
+from tema.engines import DEFAULT_ENGINE, ENGINES
+from tema.marketlog import LOG_MODES, configure_logging
 from tema.marketplace import Marketplace
-from tema.product import Product, Coffee, Tea
+from tema.order_sink import BufferedOrderSink, OrderSink
+from tema.product import PRODUCT_TYPES
+
+
+def parse_args():
+    """
+        Parses the command line: the input file and the Marketplace options
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filename", help="the market configuration file")
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                        help="run the producers and consumers as threads, as asyncio tasks, "
+                             "as threads spread over worker processes or as asyncio tasks "
+                             "on a virtual clock")
+    parser.add_argument("--processes", type=int, default=4,
+                        help="the number of worker processes of the processes engine")
+    parser.add_argument("--locking", choices=["global", "striped"], default="global",
+                        help="the Marketplace's locking mode")
+    parser.add_argument("--stripes", type=int, default=64,
+                        help="the number of product stripes for the striped locking")
+    parser.add_argument("--buffer-orders", action="store_true",
+                        help="keep every consumer's orders until it exits")
+    parser.add_argument("--log", choices=LOG_MODES, default="queue",
+                        help="how the Marketplace calls are logged")
+    parser.add_argument("--log-file", default="marketplace.log",
+                        help="the file the Marketplace calls are logged to")
+    parser.add_argument("--log-sample", type=int, default=1,
+                        help="log only one in every LOG_SAMPLE calls of a method")
+    parser.add_argument("--hold-ttl", type=float, metavar="SECONDS",
+                        help="give back the units that stay in a cart longer than SECONDS "
+                             "without being ordered, with the threads engine")
+    parser.add_argument("--fair", action="store_true",
+                        help="hand off the units to the waiting consumers in order, "
+                             "with the threads engine")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="instrument the threads engine's Marketplace and write its "
+                             "metrics to FILE in the Prometheus text format")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record the threads engine's Marketplace calls to FILE, "
+                             "see benchmarks/replay.py")
+
+    return parser.parse_args()
 
 
 def main():
@@ -20,54 +67,166 @@ def main():
         Convert the market_configuration input file into specific models:
         Producer, Consumer, Marketplace
     """
+    args = parse_args()
+    catalog = ProductCatalog()
+
+    shutdown_logging = configure_logging(args.log, args.log_file, sample_every=args.log_sample)
     try:
-        filename = sys.argv[1]
-    except IndexError:
-        print("no input file specified")
-        raise SystemExit
+        with open(args.filename, encoding='utf-8') as input_file:
+            sections = read_config(input_file, catalog)
+            if args.engine == "threads":
+                run_threads(sections, catalog, args)
+                return
+
+            market_config = collect_config(sections)
+
+        if args.engine == "asyncio":
+            import asyncio
+            asyncio.run(run_asyncio(market_config, catalog, args))
+        elif args.engine == "simulation":
+            from tema.simulation import check_config, run_simulation
+            check_config(market_config)
+            run_simulation(run_asyncio(market_config, catalog, args))
+        else:
+            from tema.shared_marketplace import run_processes
+            run_processes(market_config, catalog, args.processes, log_mode=args.log,
+                          log_sample=args.log_sample, log_file=args.log_file)
+    finally:
+        shutdown_logging()
+
+
+def read_config(input_file, catalog):
+    """
+        Yields the sections of the configuration file as they are read, with the
+        product ids replaced by products; the products must come first in the file
+    """
+    products = {}
 
-    with open(filename) as input_file:
-        market_config = loads(input_file.read())
+    for section, config in iter_config(input_file):
+        if section == 'products':
+            # turn product definitions into actual products, interned in the catalog
+            for k, products_dict in config.items():
+                params = {k: products_dict[k] for k in products_dict.keys()
+                          if k != 'product_type'}
+                products[k] = catalog.canonical(
+                    PRODUCT_TYPES[products_dict['product_type']](**params))
+            continue
+
+        if section == 'producer':
+            # turn product ids into products in producers
+            config['products'] = [(products[i], quantity, sleep_time)
+                                  for i, quantity, sleep_time
+                                  in config['products']]
+        elif section == 'consumer':
+            # turn product ids into products in consumer order lists and expected carts
+            for cart in config['carts']:
+                for operation in cart:
+                    operation['product'] = products[operation['product']]
+
+        yield section, config
+
+
+def collect_config(sections):
+    """
+        Gathers the sections of the configuration file in a market configuration
+    """
+    market_config = {'producers': [], 'consumers': []}
+    for section, config in sections:
+        if section in ('producer', 'consumer'):
+            market_config[section + 's'].append(config)
+        else:
+            market_config[section] = config
 
-    # turn product definitions into actual products
-    products = {}
+    return market_config
+
+
+def make_order_sink(args):
+    """
+        Returns the sink that writes the placed orders to stdout
+    """
+    return BufferedOrderSink() if args.buffer_orders else OrderSink()
 
-    for k, products_dict in market_config['products'].items():
-        params = {k: products_dict[k] for k in products_dict.keys() if k != 'product_type'}
-        products[k] = globals()[products_dict['product_type']](**params)
-    del market_config['products']
 
-    # turn product ids into products in producers
-    for producer in market_config['producers']:
-        producer['products'] = [(products[i], quantity, sleep_time)
-                                for i, quantity, sleep_time
-                                in producer['products']]
+def run_threads(sections, catalog, args):
+    """
+        Runs every producer and consumer in its own thread, started as soon as its
+        configuration is read; the ones read before the marketplace's configuration
+        wait for it
+    """
+    marketplace = None
+    pending = []
+    consumers = []
+    if args.metrics:
+        from tema.metrics import Metrics
+    if args.trace:
+        from tema.trace import TraceRecorder
+
+    def start(section, config):
+        if section == 'producer':
+            Producer(**config, marketplace=marketplace, daemon=True).start()
+        elif section == 'consumer':
+            consumer = Consumer(**config, marketplace=marketplace)
+            consumer.start()
+            consumers.append(consumer)
+
+    for section, config in sections:
+        if section == 'marketplace':
+            # build the marketplace
+            trace = (TraceRecorder(args.trace, config['queue_size_per_producer'])
+                     if args.trace else None)
+            marketplace = Marketplace(**config,
+                                      locking=args.locking, stripes=args.stripes,
+                                      order_sink=make_order_sink(args), catalog=catalog,
+                                      metrics=Metrics() if args.metrics else None,
+                                      hold_ttl=args.hold_ttl, fair=args.fair, trace=trace)
+            for pending_section, pending_config in pending:
+                start(pending_section, pending_config)
+            pending = None
+        elif marketplace is None:
+            pending.append((section, config))
+        else:
+            start(section, config)
+
+    if marketplace is None:
+        raise ValueError("the configuration has no marketplace")
 
-    # turn product ids into products in consumer order lists and expected carts
-    for consumer in market_config['consumers']:
-        for cart in consumer['carts']:
-            for operation in cart:
-                operation['product'] = products[operation['product']]
+    for consumer in consumers:
+        consumer.join()
 
-    # build the marketplace
-    marketplace = Marketplace(**market_config['marketplace'])
+    if args.trace:
+        # the producers keep running, their later calls are not recorded
+        marketplace.trace.close(catalog)
 
-    # build and start the producers
-    producers = [Producer(**p_market_config, marketplace=marketplace, daemon=True)
-                 for p_market_config in market_config['producers']]
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(marketplace.metrics.prometheus())
 
-    for producer in producers:
-        producer.start()
 
-    # build and start the consumers
-    consumers = [Consumer(**c_market_config, marketplace=marketplace)
-                 for c_market_config in market_config['consumers']]
+async def run_asyncio(market_config, catalog, args):
+    """
+        Runs every producer and consumer as a task on the current event loop
+    """
+    import asyncio
+    from tema.async_consumer import AsyncConsumer
+    from tema.async_marketplace import AsyncMarketplace
+    from tema.async_producer import AsyncProducer
 
-    for consumer in consumers:
-        consumer.start()
+    marketplace = AsyncMarketplace(**market_config['marketplace'],
+                                   order_sink=make_order_sink(args), catalog=catalog)
 
-    for consumer in consumers:
-        consumer.join()
+    producers = [AsyncProducer(**p_market_config, marketplace=marketplace)
+                 for p_market_config in market_config['producers']]
+    producer_tasks = [asyncio.create_task(producer.run(), name=producer.name)
+                      for producer in producers]
+
+    # the task's name is the one printed by place_order
+    consumers = [AsyncConsumer(**c_market_config, marketplace=marketplace)
+                 for c_market_config in market_config['consumers']]
+    await asyncio.gather(*(asyncio.create_task(consumer.run(), name=consumer.name)
+                           for consumer in consumers))
+
+    for task in producer_tasks:
+        task.cancel()
 
 
 if __name__ == '__main__':